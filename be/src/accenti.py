@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lessico delle posizioni d'accento e classificazione ritmica dei versi.
+
+L'accento di una parola è espresso come posizione dal fondo: 0 tronca,
+1 piana, 2 sdrucciola, 3 bisdrucciola. Nel database si salvano solo le
+parole che non seguono le regole di default (piana, oppure tronca se c'è
+l'accento grafico finale o se la parola è apocopata), così il lessico
+resta piccolo. Viene caricato in memoria solo al primo uso. Come per le
+eccezioni (lessico.py) un trigger incrementa un contatore a ogni modifica
+della tabella, così la versione del lessico vale tra processi e riavvii.
+"""
+
+import sqlite3
+import threading
+import time
+
+from sillabazione import VOCALI, VOCALI_ACCENTATE, VOCALI_DEBOLI, VOCALI_FORTI, normalizza_parola, sillaba_parola
+
+TRONCA = 0
+PIANA = 1
+SDRUCCIOLA = 2
+BISDRUCCIOLA = 3
+
+NOMI_USCITA = {TRONCA: "tronca", PIANA: "piana", SDRUCCIOLA: "sdrucciola", BISDRUCCIOLA: "bisdrucciola"}
+
+# Sdrucciole frequenti nella lingua poetica: il resto si aggiunge con aggiungi_accento()
+ACCENTI_INIZIALI = {
+    "anima": SDRUCCIOLA, "anime": SDRUCCIOLA, "angelo": SDRUCCIOLA, "angeli": SDRUCCIOLA,
+    "opera": SDRUCCIOLA, "secolo": SDRUCCIOLA, "popolo": SDRUCCIOLA, "subito": SDRUCCIOLA,
+    "numero": SDRUCCIOLA, "lagrime": SDRUCCIOLA, "lacrime": SDRUCCIOLA, "tenebre": SDRUCCIOLA,
+    "femmina": SDRUCCIOLA, "ultimo": SDRUCCIOLA, "ultima": SDRUCCIOLA, "unico": SDRUCCIOLA,
+    "simile": SDRUCCIOLA, "umile": SDRUCCIOLA, "nobile": SDRUCCIOLA, "povero": SDRUCCIOLA,
+    "vergine": SDRUCCIOLA, "ordine": SDRUCCIOLA, "origine": SDRUCCIOLA, "imagine": SDRUCCIOLA,
+    "immagine": SDRUCCIOLA, "margine": SDRUCCIOLA, "termine": SDRUCCIOLA, "giovane": SDRUCCIOLA,
+    "spirito": SDRUCCIOLA, "spiriti": SDRUCCIOLA, "lucido": SDRUCCIOLA, "fulgido": SDRUCCIOLA,
+    "limpido": SDRUCCIOLA, "tacito": SDRUCCIOLA, "debole": SDRUCCIOLA, "facile": SDRUCCIOLA,
+    "mobile": SDRUCCIOLA, "rapido": SDRUCCIOLA, "tremulo": SDRUCCIOLA, "tenero": SDRUCCIOLA,
+    "tenera": SDRUCCIOLA, "candido": SDRUCCIOLA, "candida": SDRUCCIOLA, "pallido": SDRUCCIOLA,
+    "pallida": SDRUCCIOLA, "gelido": SDRUCCIOLA, "gelida": SDRUCCIOLA, "vivida": SDRUCCIOLA,
+    "lugubre": SDRUCCIOLA, "zefiro": SDRUCCIOLA, "fecemi": SDRUCCIOLA, "dissemi": SDRUCCIOLA,
+    "fossero": SDRUCCIOLA, "dissero": SDRUCCIOLA, "videro": SDRUCCIOLA, "fecero": SDRUCCIOLA,
+    "ebbero": SDRUCCIOLA, "cantano": SDRUCCIOLA, "dicono": SDRUCCIOLA,
+    "vengono": SDRUCCIOLA, "parlano": SDRUCCIOLA, "portano": SDRUCCIOLA, "tornano": SDRUCCIOLA,
+    "dimmelo": BISDRUCCIOLA, "abitano": BISDRUCCIOLA, "meritano": BISDRUCCIOLA,
+}
+
+# Parole atone: non portano ictus nel verso
+ATONE = {
+    "il", "lo", "la", "i", "gli", "le", "l", "un", "uno", "una", "di", "a", "da", "in", "con",
+    "su", "per", "tra", "fra", "e", "ed", "o", "od", "ma", "se", "che", "ch", "non", "mi", "ti",
+    "si", "ci", "vi", "ne", "de", "del", "dei", "della", "delle", "al", "ai", "alla", "nel",
+    "nella", "dal", "dalla", "sul", "col", "d", "s", "m", "t", "v",
+}
+
+
+def init_accenti(db_path):
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS accenti (
+            parola TEXT PRIMARY KEY,
+            posizione INTEGER
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS accenti_versione (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            versione INTEGER NOT NULL
+        )
+    """)
+    cur.execute("INSERT OR IGNORE INTO accenti_versione (id, versione) VALUES (0, 0)")
+    for evento in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS accenti_{evento.lower()}_versione
+            AFTER {evento} ON accenti
+            BEGIN
+                UPDATE accenti_versione SET versione = versione + 1 WHERE id = 0;
+            END
+        """)
+    cur.execute("SELECT COUNT(*) FROM accenti")
+    if cur.fetchone()[0] == 0:
+        cur.executemany("INSERT OR IGNORE INTO accenti (parola, posizione) VALUES (?, ?)",
+                        list(ACCENTI_INIZIALI.items()))
+    conn.commit()
+    conn.close()
+
+
+def versione_accenti(db_path):
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("SELECT versione FROM accenti_versione WHERE id = 0")
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+
+class LessicoAccenti:
+    """Lessico delle posizioni d'accento, caricato dal database al primo utilizzo."""
+
+    def __init__(self, db_path, intervallo=1.0):
+        self.db_path = db_path
+        self.intervallo = intervallo
+        self._voci = None
+        # Contatore della tabella accenti_versione al momento della lettura delle voci
+        self.versione = None
+        self.ultimo_controllo = 0.0
+        self.lock = threading.Lock()
+
+    def _leggi(self):
+        init_accenti(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        cur = conn.cursor()
+        # Lettura di versione e righe nella stessa transazione, così restano coerenti
+        cur.execute("BEGIN")
+        cur.execute("SELECT versione FROM accenti_versione WHERE id = 0")
+        versione = cur.fetchone()[0]
+        cur.execute("SELECT parola, posizione FROM accenti")
+        self._voci = dict(cur.fetchall())
+        conn.rollback()
+        conn.close()
+        self.versione = versione
+        self.ultimo_controllo = time.monotonic()
+
+    def carica(self):
+        """Legge le voci dal database, se non sono già state caricate."""
+        if self._voci is None:
+            with self.lock:
+                if self._voci is None:
+                    self._leggi()
+        return self._voci
+
+    @property
+    def voci(self):
+        return self.carica()
+
+    def versione_corrente(self):
+        """
+        Restituisce la versione del lessico, rileggendo le voci se la tabella è cambiata.
+        Il controllo sul database avviene al massimo una volta ogni `intervallo` secondi.
+        """
+        self.carica()
+        if time.monotonic() - self.ultimo_controllo >= self.intervallo:
+            with self.lock:
+                self.ultimo_controllo = time.monotonic()
+                if versione_accenti(self.db_path) != self.versione:
+                    self._leggi()
+        return self.versione
+
+    def aggiungi_accento(self, parola, posizione):
+        self.carica()
+        conn = sqlite3.connect(self.db_path)
+        cur = conn.cursor()
+        cur.execute("INSERT OR REPLACE INTO accenti (parola, posizione) VALUES (?, ?)", (parola, posizione))
+        conn.commit()
+        conn.close()
+        with self.lock:
+            self._leggi()
+
+    def posizione_accento(self, parola, sillabe):
+        """
+        Args:
+            parola: La parola già normalizzata (minuscolo, senza punteggiatura)
+            sillabe: Numero di sillabe della parola
+
+        Returns:
+            Posizione della sillaba tonica contata dal fondo (0 = ultima)
+        """
+        if sillabe <= 1:
+            return TRONCA
+        posizione = self.voci.get(parola)
+        if posizione is None:
+            ultima = parola.rstrip("'’")[-1:]
+            if ultima in VOCALI_ACCENTATE:
+                posizione = TRONCA
+            elif ultima and ultima not in VOCALI:
+                # Parola apocopata (amor, cammin, pensier): l'accento resta sull'ultima
+                posizione = TRONCA
+            elif ultima in VOCALI_DEBOLI and len(parola) > 1 and parola[-2] in VOCALI_FORTI:
+                # Dittongo discendente finale (ritrovai, sarei, costei): tonico
+                posizione = TRONCA
+            elif any(c in VOCALI_ACCENTATE for c in parola):
+                divisione, _ = sillaba_parola(parola)
+                tonica = next(i for i, s in enumerate(divisione) if any(c in VOCALI_ACCENTATE for c in s))
+                posizione = len(divisione) - 1 - tonica
+            else:
+                posizione = PIANA
+        return min(posizione, sillabe - 1)
+
+
+def tipo_endecasillabo(ictus):
+    """Restituisce "a maiore", "a minore" o None per un endecasillabo con gli ictus dati."""
+    if 10 not in ictus:
+        return None
+    if 6 in ictus and not (4 in ictus and 8 in ictus):
+        return "a maiore"
+    if 4 in ictus:
+        return "a minore"
+    return None
+
+
+def classifica_verso(lessico, testi_token, conteggi, sinalefe):
+    """
+    Calcola ictus, uscita e tipo di endecasillabo di un verso in un solo passaggio sui token.
+
+    Args:
+        lessico: Il LessicoAccenti da usare
+        testi_token: Testi dei token del verso
+        conteggi: Sillabe di ciascun token (come da conta_sillabe_token)
+        sinalefe: Insieme degli indici i per cui c'è sinalefe tra il token i e il token i+1
+
+    Returns:
+        Dizionario con "ictus" (posizioni metriche delle toniche), "uscita" e "tipo"
+    """
+    ictus = []
+    posizione_corrente = 0
+    ultima_posizione = None
+    for i, (testo, sillabe) in enumerate(zip(testi_token, conteggi)):
+        if not sillabe:
+            continue
+        if i - 1 in sinalefe:
+            # La prima sillaba si fonde con l'ultima del token precedente
+            posizione_corrente -= 1
+        parola = normalizza_parola(testo)
+        dal_fondo = lessico.posizione_accento(parola, sillabe)
+        if parola not in ATONE:
+            posizione = posizione_corrente + sillabe - dal_fondo
+            # Con la sinalefe tra due toniche (vi-a e-ra) l'ictus cade una volta sola
+            if not ictus or ictus[-1] != posizione:
+                ictus.append(posizione)
+            ultima_posizione = dal_fondo
+        posizione_corrente += sillabe
+    uscita = NOMI_USCITA.get(ultima_posizione)
+    return {"ictus": ictus, "uscita": uscita, "tipo": tipo_endecasillabo(ictus)}
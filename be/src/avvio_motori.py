@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Caricamento dei motori all'avvio dell'API.
+
+Ogni motore (pipeline spaCy, modello del copilota, ...) ha una funzione di
+caricamento e una di riscaldamento, che esegue una piccola inferenza di
+prova così l'inizializzazione pigra dei kernel non ricade sulla prima
+richiesta vera. I motori si caricano in parallelo, ciascuno nel suo thread,
+mentre l'app risponde già: lo stato di ognuno, con i tempi di caricamento e
+riscaldamento, alimenta /readyz.
+"""
+
+import asyncio
+import time
+
+IN_ATTESA = "in_attesa"
+IN_CARICAMENTO = "in_caricamento"
+PRONTO = "pronto"
+ERRORE = "errore"
+
+
+class Motore:
+    def __init__(self, nome, carica, riscalda=None):
+        self.nome = nome
+        self.carica = carica
+        self.riscalda = riscalda
+        self.stato = IN_ATTESA
+        self.caricamento_s = None
+        self.riscaldamento_s = None
+        self.errore = None
+
+    def avvia(self):
+        """Carica e riscalda il motore; bloccante, da eseguire in un thread."""
+        self.stato = IN_CARICAMENTO
+        try:
+            inizio = time.perf_counter()
+            self.carica()
+            self.caricamento_s = round(time.perf_counter() - inizio, 3)
+            if self.riscalda is not None:
+                inizio = time.perf_counter()
+                self.riscalda()
+                self.riscaldamento_s = round(time.perf_counter() - inizio, 3)
+            self.stato = PRONTO
+        except Exception as e:
+            self.errore = f"{type(e).__name__}: {e}"
+            self.stato = ERRORE
+
+    def descrizione(self):
+        return {
+            "stato": self.stato,
+            "caricamento_s": self.caricamento_s,
+            "riscaldamento_s": self.riscaldamento_s,
+            "errore": self.errore,
+        }
+
+
+class Motori:
+    def __init__(self):
+        self.motori = {}
+        self.avvio = None
+
+    def registra(self, nome, carica, riscalda=None):
+        self.motori[nome] = Motore(nome, carica, riscalda)
+
+    def avvia(self):
+        """Avvia in background il caricamento parallelo di tutti i motori registrati."""
+        if self.avvio is None:
+            self.avvio = asyncio.gather(*(asyncio.to_thread(motore.avvia) for motore in self.motori.values()))
+        return self.avvio
+
+    def pronti(self):
+        return all(motore.stato == PRONTO for motore in self.motori.values())
+
+    def descrizione(self):
+        return {
+            "pronto": self.pronti(),
+            "motori": {nome: motore.descrizione() for nome, motore in self.motori.items()},
+        }
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark di velocità e accuratezza della scansione metrica su commedia.txt.
+
+Quasi ogni verso della Commedia è un endecasillabo, quindi la quota di versi
+contati 11 misura l'accuratezza del contatore. Il benchmark riporta versi al
+secondo, latenza per verso (p50/p99), picco di memoria e accuratezza, e può
+salvare i risultati come baseline JSON o confrontarli con una baseline esistente.
+Velocità e latenze si misurano a freddo, con il memo delle sillabe svuotato
+prima di ogni fase, e a caldo, ripetendo la fase sul memo appena riempito:
+altrimenti la seconda fase misurerebbe il memo lasciato dalla prima.
+
+Utilizzo (dalla cartella be):
+    python src/benchmark_scansione.py [--backend regole] [--salva baseline.json] [--baseline baseline.json]
+"""
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+from pathlib import Path
+
+import server
+from risultati_colonnari import RE_CANTO
+
+COMMEDIA = Path(__file__).resolve().parents[2] / "commedia.txt"
+
+# Tolleranze per il confronto con la baseline
+TOLLERANZA_VELOCITA = 0.10
+TOLLERANZA_ACCURATEZZA = 0.0
+
+
+def leggi_versi(percorso_file):
+    with open(percorso_file, "r", encoding="utf-8") as f:
+        return [riga.rstrip("\n") for riga in f if riga.strip() and not RE_CANTO.match(riga)]
+
+
+def percentile(valori_ordinati, p):
+    if not valori_ordinati:
+        return 0.0
+    indice = min(len(valori_ordinati) - 1, int(round(p / 100 * (len(valori_ordinati) - 1))))
+    return valori_ordinati[indice]
+
+
+def svuota_memo():
+    """Riporta il memo delle sillabe a freddo."""
+    with server.MEMO.lock:
+        server.MEMO.voci.clear()
+
+
+def misura_throughput(versi, backend, batch_size):
+    inizio = time.perf_counter()
+    conteggi = [totale for _, totale, _, _ in server.analizza_versi(versi, batch_size=batch_size, backend=backend)]
+    durata = time.perf_counter() - inizio
+    return conteggi, durata
+
+
+def misura_latenze(versi, backend):
+    """Latenza di un verso analizzato da solo, come nel feedback dell'editor."""
+    latenze = []
+    for verso in versi:
+        inizio = time.perf_counter()
+        for _ in server.analizza_versi([verso], backend=backend):
+            pass
+        latenze.append(time.perf_counter() - inizio)
+    latenze.sort()
+    return latenze
+
+
+def esegui_benchmark(percorso_file, backend, batch_size):
+    versi = leggi_versi(percorso_file)
+
+    inizio = time.perf_counter()
+    server.riscalda()
+    riscaldamento = time.perf_counter() - inizio
+
+    svuota_memo()
+    conteggi, durata = misura_throughput(versi, backend, batch_size)
+    _, durata_caldo = misura_throughput(versi, backend, batch_size)
+    svuota_memo()
+    latenze = misura_latenze(versi, backend)
+    latenze_caldo = misura_latenze(versi, backend)
+    endecasillabi = sum(1 for totale in conteggi if totale == 11)
+    # ru_maxrss è in KB su Linux e in byte su macOS
+    picco_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        picco_rss //= 1024
+
+    return {
+        "file": str(percorso_file),
+        "backend": backend,
+        "batch_size": batch_size,
+        "python": platform.python_version(),
+        "versi": len(versi),
+        "riscaldamento_s": round(riscaldamento, 3),
+        "durata_s": round(durata, 3),
+        "durata_caldo_s": round(durata_caldo, 3),
+        "versi_al_secondo": round(len(versi) / durata, 1) if durata else 0.0,
+        "versi_al_secondo_caldo": round(len(versi) / durata_caldo, 1) if durata_caldo else 0.0,
+        "latenza_p50_ms": round(percentile(latenze, 50) * 1000, 3),
+        "latenza_p99_ms": round(percentile(latenze, 99) * 1000, 3),
+        "latenza_p50_caldo_ms": round(percentile(latenze_caldo, 50) * 1000, 3),
+        "latenza_p99_caldo_ms": round(percentile(latenze_caldo, 99) * 1000, 3),
+        "picco_rss_mb": round(picco_rss / 1024, 1),
+        "quota_endecasillabi": round(endecasillabi / len(versi), 4) if versi else 0.0,
+    }
+
+
+def confronta(risultato, baseline):
+    """Restituisce la lista delle regressioni rispetto alla baseline."""
+    regressioni = []
+    if risultato["quota_endecasillabi"] < baseline["quota_endecasillabi"] - TOLLERANZA_ACCURATEZZA:
+        regressioni.append(
+            f"accuratezza: {risultato['quota_endecasillabi']:.2%} < {baseline['quota_endecasillabi']:.2%}"
+        )
+    if risultato["versi_al_secondo"] < baseline["versi_al_secondo"] * (1 - TOLLERANZA_VELOCITA):
+        regressioni.append(
+            f"velocità: {risultato['versi_al_secondo']} < {baseline['versi_al_secondo']} versi/s"
+        )
+    return regressioni
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark della scansione metrica su commedia.txt")
+    parser.add_argument("file", nargs="?", default=str(COMMEDIA), help="File di versi da scandire")
+    parser.add_argument("--backend", default=server.BACKEND_SILLABE, choices=["spacy", "regole"])
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--salva", help="Salva i risultati come baseline JSON")
+    parser.add_argument("--baseline", help="Confronta i risultati con una baseline JSON")
+    args = parser.parse_args()
+
+    risultato = esegui_benchmark(args.file, args.backend, args.batch_size)
+    print(json.dumps(risultato, indent=2, ensure_ascii=False))
+
+    if args.salva:
+        with open(args.salva, "w", encoding="utf-8") as f:
+            json.dump(risultato, f, indent=2, ensure_ascii=False)
+        print(f"\nBaseline salvata in {args.salva}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("backend") != risultato["backend"]:
+            print(f"\nAttenzione: la baseline usa il backend {baseline.get('backend')!r}")
+        regressioni = confronta(risultato, baseline)
+        if regressioni:
+            print("\nRegressioni rispetto alla baseline:")
+            for regressione in regressioni:
+                print(f"- {regressione}")
+            sys.exit(1)
+        print("\nNessuna regressione rispetto alla baseline.")
+
+
+if __name__ == "__main__":
+    main()
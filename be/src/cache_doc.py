@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache su disco dei versi già analizzati da spaCy.
+
+Ogni doc è salvato con DocBin sotto la chiave sha1 del verso; le estensioni
+syllables e syllables_count sono salvate a parte, una lista per record,
+perché decodificare doc.user_data doc per doc costa più dell'analisi.
+La cache è divisa in shard per prefisso della chiave, in una cartella per
+versione del modello: uno shard viene letto solo quando serve un suo verso.
+Ogni shard è una sequenza di record msgpack e salva aggiunge in coda un
+record con le sole voci nuove; uno shard con più di RECORD_MAX record viene
+riscritto in un record unico al salvataggio successivo.
+In memoria restano al più `capacita` doc: superato il limite gli shard usati
+meno di recente vengono salvati e scaricati, così la scansione in streaming
+di un corpus lungo non accumula doc. Le chiavi sono hash, quindi ogni blocco
+di versi tocca quasi tutti gli shard: la cache conviene quando il corpus
+rianalizzato sta nella capacità, altrimenti la memoria resta limitata ma gli
+shard vengono riletti più volte. Dopo una modifica al lessico delle
+eccezioni i conteggi si rifanno sui doc in cache, senza ripassare dalla
+pipeline.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# Numero di caratteri esadecimali della chiave usati per scegliere lo shard (16**1 = 16 shard).
+# Ogni lettura di DocBin ha un costo fisso, quindi conviene avere pochi shard grandi.
+PREFISSO_SHARD = 1
+# Doc tenuti in memoria prima di scaricare gli shard meno usati
+CAPACITA = 50000
+# Record oltre i quali uno shard viene ricompattato
+RECORD_MAX = 8
+
+
+def chiave_verso(verso):
+    return hashlib.sha1(verso.encode("utf-8")).hexdigest()
+
+
+def chiave_estensione(nome, token):
+    """
+    Chiave di doc.user_data in cui spaCy tiene token._.<nome>: leggere e scrivere lì
+    direttamente evita di creare un oggetto Underscore per ogni token, che su un
+    corpus intero costa quanto ricalcolare le sillabe.
+    """
+    return ("._.", nome, token.idx, None)
+
+
+def versione_modello(nlp):
+    """Identifica pipeline e versione di spaCy: se cambia uno dei due la cache riparte da zero."""
+    import spacy
+
+    meta = nlp.meta
+    versione = f"{meta.get('lang', nlp.lang)}_{meta.get('name', 'pipeline')}-{meta.get('version', '0')}"
+    versione += f"_spacy-{spacy.__version__}_" + "+".join(nlp.pipe_names)
+    return re.sub(r"[^\w.+-]", "_", versione)
+
+
+class CacheDoc:
+    def __init__(self, cartella, nlp, capacita=CAPACITA):
+        self.nlp = nlp
+        self.versione = versione_modello(nlp)
+        self.cartella = os.path.join(cartella, self.versione)
+        self.capacita = capacita
+        # prefisso -> {chiave: doc}, dal meno al più usato di recente
+        self.shard = OrderedDict()
+        self.doc_in_memoria = 0
+        # prefisso -> chiavi aggiunte e non ancora scritte
+        self.nuove = {}
+        self.da_compattare = set()
+        self.hits = 0
+        self.misses = 0
+        self.scaricati = 0
+        self.lock = threading.Lock()
+
+    def _percorso(self, prefisso):
+        return os.path.join(self.cartella, f"{prefisso}.spacy")
+
+    def _leggi_shard(self, prefisso):
+        from spacy.tokens import DocBin
+        from srsly.msgpack import Unpacker
+
+        docs = {}
+        percorso = self._percorso(prefisso)
+        if not os.path.exists(percorso):
+            return docs
+        with open(percorso, "rb") as f:
+            record = Unpacker(f, raw=False, max_buffer_size=0)
+            letti = 0
+            for dati in record:
+                docbin = DocBin().from_bytes(dati["docbin"])
+                for chiave, sillabe, doc in zip(dati["chiavi"], dati["sillabe"], docbin.get_docs(self.nlp.vocab)):
+                    valori = doc.user_data
+                    for token, sillabe_token in zip(doc, sillabe):
+                        if sillabe_token is not None:
+                            valori[chiave_estensione("syllables", token)] = sillabe_token
+                            valori[chiave_estensione("syllables_count", token)] = len(sillabe_token)
+                    docs[chiave] = doc
+                letti += 1
+            # Un record troncato (salvataggio interrotto) si elimina riscrivendo lo shard
+            if letti > RECORD_MAX or record.tell() < os.fstat(f.fileno()).st_size:
+                self.da_compattare.add(prefisso)
+        return docs
+
+    def _carica_shard(self, prefisso):
+        docs = self.shard.get(prefisso)
+        if docs is not None:
+            self.shard.move_to_end(prefisso)
+            return docs
+        docs = self._leggi_shard(prefisso)
+        self.shard[prefisso] = docs
+        self.doc_in_memoria += len(docs)
+        self._scarica(tieni=prefisso)
+        return docs
+
+    def _scarica(self, tieni):
+        """Salva e toglie dalla memoria gli shard meno usati finché i doc rientrano nella capacità."""
+        while self.doc_in_memoria > self.capacita and len(self.shard) > 1:
+            prefisso = next(iter(self.shard))
+            if prefisso == tieni:
+                self.shard.move_to_end(prefisso)
+                continue
+            self._scrivi(prefisso)
+            self.doc_in_memoria -= len(self.shard.pop(prefisso))
+            self.scaricati += 1
+
+    def get(self, chiave):
+        with self.lock:
+            doc = self._carica_shard(chiave[:PREFISSO_SHARD]).get(chiave)
+        if doc is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return doc
+
+    def get_blocco(self, chiavi):
+        """Come get su una lista di chiavi, ma leggendo ogni shard una volta sola."""
+        docs = [None] * len(chiavi)
+        per_shard = {}
+        for i, chiave in enumerate(chiavi):
+            per_shard.setdefault(chiave[:PREFISSO_SHARD], []).append(i)
+        for indici in per_shard.values():
+            for i in indici:
+                docs[i] = self.get(chiavi[i])
+        return docs
+
+    def put(self, chiave, doc):
+        prefisso = chiave[:PREFISSO_SHARD]
+        with self.lock:
+            docs = self._carica_shard(prefisso)
+            if chiave not in docs:
+                self.doc_in_memoria += 1
+            docs[chiave] = doc
+            self.nuove.setdefault(prefisso, []).append(chiave)
+
+    def _scrivi(self, prefisso):
+        """Aggiunge allo shard le voci nuove, o lo riscrive intero se va ricompattato."""
+        import srsly
+        from spacy.tokens import DocBin
+
+        nuove = self.nuove.pop(prefisso, None)
+        compatta = prefisso in self.da_compattare
+        if not nuove and not compatta:
+            return
+        docs = self.shard[prefisso]
+        chiavi = list(docs) if compatta else list(dict.fromkeys(nuove))
+        dati = {
+            "chiavi": chiavi,
+            "sillabe": [[docs[chiave].user_data.get(chiave_estensione("syllables", token)) for token in docs[chiave]]
+                        for chiave in chiavi],
+            "docbin": DocBin(docs=[docs[chiave] for chiave in chiavi]).to_bytes(),
+        }
+        os.makedirs(self.cartella, exist_ok=True)
+        if compatta:
+            temporaneo = self._percorso(prefisso) + ".tmp"
+            with open(temporaneo, "wb") as f:
+                f.write(srsly.msgpack_dumps(dati))
+            os.replace(temporaneo, self._percorso(prefisso))
+            self.da_compattare.discard(prefisso)
+        else:
+            with open(self._percorso(prefisso), "ab") as f:
+                f.write(srsly.msgpack_dumps(dati))
+
+    def salva(self):
+        """Scrive le voci nuove degli shard in memoria."""
+        with self.lock:
+            for prefisso in list(self.shard):
+                self._scrivi(prefisso)
+
+    def get_current_stats(self):
+        totale = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / totale if totale else 0.0,
+            "shard_caricati": len(self.shard),
+            "shard_scaricati": self.scaricati,
+            "doc_in_memoria": self.doc_in_memoria,
+        }
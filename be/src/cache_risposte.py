@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache delle risposte dell'API, indirizzata per contenuto.
+
+La chiave è lo sha256 dell'input normalizzato, dei parametri dell'analisi e
+della versione del motore (che include l'impronta del lessico delle
+eccezioni): la stessa richiesta produce sempre la stessa chiave, quindi la
+chiave fa anche da ETag e un If-None-Match uguale si risolve con un 304
+senza nemmeno guardare in cache. I corpi JSON già serializzati stanno in un
+LRU limitato in byte e, se è indicato un database, anche su SQLite.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+CAPACITA_BYTE = 64 * 1024 * 1024
+VOCI_DISCO = 100000
+
+
+def normalizza_testo(testo):
+    """NFC, a capo uniformi e senza spazi in coda alle righe: varianti che non cambiano l'analisi."""
+    testo = unicodedata.normalize("NFC", testo).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(riga.rstrip() for riga in testo.split("\n"))
+
+
+def chiave_risposta(endpoint, input_normalizzato, parametri, versione_motore):
+    sha = hashlib.sha256()
+    intestazione = json.dumps([endpoint, parametri, versione_motore], sort_keys=True, ensure_ascii=False)
+    sha.update(intestazione.encode("utf-8"))
+    sha.update(b"\0")
+    sha.update(input_normalizzato.encode("utf-8"))
+    return sha.hexdigest()
+
+
+def etag(chiave):
+    return f'"{chiave[:32]}"'
+
+
+def corrisponde(if_none_match, chiave):
+    """
+    Verifica l'header If-None-Match (anche con più ETag) contro la chiave. "*" non
+    corrisponde: vale per qualunque rappresentazione, anche di un motore diverso.
+    """
+    if not if_none_match:
+        return False
+    valori = {valore.strip().removeprefix("W/") for valore in if_none_match.split(",")}
+    return etag(chiave) in valori
+
+
+class CacheRisposte:
+    def __init__(self, capacita_byte=CAPACITA_BYTE, db_path=None, voci_disco=VOCI_DISCO):
+        self.capacita_byte = capacita_byte
+        self.db_path = db_path
+        self.voci_disco = voci_disco
+        self.voci = OrderedDict()
+        self.byte = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if self.db_path:
+            self.init_tabella()
+
+    def init_tabella(self):
+        conn = sqlite3.connect(self.db_path)
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS cache_risposte (
+                chiave TEXT PRIMARY KEY,
+                corpo BLOB,
+                ultimo_uso REAL
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_cache_risposte_uso ON cache_risposte (ultimo_uso)")
+        conn.commit()
+        conn.close()
+
+    def _inserisci(self, chiave, corpo):
+        vecchio = self.voci.pop(chiave, None)
+        if vecchio is not None:
+            self.byte -= len(vecchio)
+        self.voci[chiave] = corpo
+        self.byte += len(corpo)
+        while self.byte > self.capacita_byte and len(self.voci) > 1:
+            _, scartato = self.voci.popitem(last=False)
+            self.byte -= len(scartato)
+
+    def _leggi_disco(self, chiave):
+        conn = sqlite3.connect(self.db_path)
+        cur = conn.cursor()
+        cur.execute("SELECT corpo FROM cache_risposte WHERE chiave = ?", (chiave,))
+        riga = cur.fetchone()
+        if riga is not None:
+            cur.execute("UPDATE cache_risposte SET ultimo_uso = ? WHERE chiave = ?", (time.time(), chiave))
+            conn.commit()
+        conn.close()
+        return riga[0] if riga else None
+
+    def get(self, chiave):
+        """Restituisce il corpo serializzato della risposta, o None."""
+        with self.lock:
+            corpo = self.voci.get(chiave)
+            if corpo is not None:
+                self.voci.move_to_end(chiave)
+                self.hits += 1
+                return corpo
+        if self.db_path:
+            corpo = self._leggi_disco(chiave)
+            if corpo is not None:
+                with self.lock:
+                    self._inserisci(chiave, corpo)
+                    self.hits += 1
+                return corpo
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, chiave, corpo):
+        with self.lock:
+            self._inserisci(chiave, corpo)
+        if self.db_path:
+            conn = sqlite3.connect(self.db_path)
+            cur = conn.cursor()
+            cur.execute("INSERT OR REPLACE INTO cache_risposte (chiave, corpo, ultimo_uso) VALUES (?, ?, ?)",
+                        (chiave, corpo, time.time()))
+            # Tiene su disco solo le voci usate più di recente
+            cur.execute("""
+                DELETE FROM cache_risposte WHERE chiave IN (
+                    SELECT chiave FROM cache_risposte ORDER BY ultimo_uso DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.voci_disco,))
+            conn.commit()
+            conn.close()
+
+    def get_current_stats(self):
+        totale = self.hits + self.misses
+        return {
+            'voci': len(self.voci),
+            'byte': self.byte,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / totale if totale else 0.0
+        }
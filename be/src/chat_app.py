@@ -5,13 +5,15 @@ from pathlib import Path
 import json
 from datetime import datetime
 import threading
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import AutoModelForCausalLM, AutoTokenizer, TextStreamer
 import torch
 import psutil
 import time
 import signal
 import sys
 
+from coda_generazioni import SchedulerGenerazioni
+
 class ChatDatabase:
     def __init__(self, db_path="chat_database.db"):
         self.db_path = db_path
@@ -211,13 +213,107 @@ class ChatMLTemplates:
             }
         }
 
+class CallbackStreamer(TextStreamer):
+    """Passa a una callback il testo decodificato man mano che model.generate produce token"""
+    def __init__(self, tokenizer, callback):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.callback = callback
+    
+    def on_finalized_text(self, text, stream_end=False):
+        if text:
+            self.callback(text)
+
+class StreamingMessage:
+    """
+    Risposta in arrivo nella chat: il thread di generazione accoda i pezzi di testo,
+    il loop di Tk li inserisce tutti insieme a ogni frame.
+    """
+    def __init__(self, app, thread_id, frame_ms):
+        self.app = app
+        self.thread_id = thread_id
+        self.frame_ms = frame_ms
+        self.pending = []
+        self.lock = threading.Lock()
+        self.mark = None
+        self.loads = None
+        self.shown = ""
+        self.detached = False
+        self.done = False
+    
+    def put(self, text):
+        """Chiamata dal thread di generazione"""
+        with self.lock:
+            self.pending.append(text)
+    
+    def start(self):
+        self.app.root.after(self.frame_ms, self._tick)
+    
+    def _tick(self):
+        if self.done:
+            return
+        self.flush()
+        self.app.root.after(self.frame_ms, self._tick)
+    
+    def flush(self):
+        with self.lock:
+            text = "".join(self.pending)
+            self.pending.clear()
+        if self.detached or not text:
+            return
+        if self.app.current_thread_id != self.thread_id or self.loads not in (None, self.app.conversation_loads):
+            # La chat è stata ricaricata o l'utente ha cambiato thread: il messaggio completo comparirà dal database
+            self.detached = True
+            return
+        
+        chat_area = self.app.chat_area
+        chat_area.config(state=tk.NORMAL)
+        if self.mark is None:
+            text = text.lstrip()
+            if not text:
+                chat_area.config(state=tk.DISABLED)
+                return
+            # Il messaggio nasce già chiuso: i pezzi successivi si inseriscono prima della
+            # riga vuota finale, così un messaggio aggiunto in fondo nel frattempo resta dopo
+            self.app.insert_label("assistant")
+            chat_area.insert(tk.END, "\n\n")
+            self.mark = f"stream_{id(self)}"
+            self.loads = self.app.conversation_loads
+            chat_area.mark_set(self.mark, tk.END + "-3c")
+            chat_area.mark_gravity(self.mark, tk.RIGHT)
+        chat_area.insert(self.mark, text)
+        self.shown += text
+        chat_area.config(state=tk.DISABLED)
+        chat_area.see(tk.END)
+    
+    def finish(self, response=None):
+        """Chiamata dal loop di Tk a generazione finita; response None se è fallita"""
+        self.flush()
+        self.done = True
+        if self.loads not in (None, self.app.conversation_loads):
+            self.detached = True
+        if self.mark is not None and response is not None and response.strip() != self.shown.strip():
+            # Il testo salvato non è quello mostrato (es. errore a metà generazione): ricarica dal database
+            self.detached = True
+        if self.mark is not None:
+            self.app.chat_area.mark_unset(self.mark)
+        if self.app.current_thread_id != self.thread_id:
+            return
+        if self.detached:
+            self.app.load_conversation()
+        elif self.mark is None and response is not None:
+            # Nessun token in streaming (es. errore o risposta vuota): mostra il testo finale
+            self.app.display_message("assistant", response)
+
 class ModelManager:
-    def __init__(self):
+    def __init__(self, max_concurrent=1, max_queued=4, deadline_s=300):
         self.model = None
         self.tokenizer = None
         self.model_name = None
         self.base_dir = Path(__file__).resolve().parent
         self.cache_dir = self.base_dir / "cache"
+        # Su CPU una generazione alla volta: due in parallelo finiscono entrambe più tardi
+        self.scheduler = SchedulerGenerazioni(concorrenza=max_concurrent, coda_max=max_queued)
+        self.deadline_s = deadline_s
     
     def load_model(self, model_name, progress_callback=None):
         if self.model_name == model_name and self.model is not None:
@@ -322,10 +418,36 @@ class ModelManager:
                 progress_callback(f"Errore: {str(e)}")
             return False
     
-    def generate_response(self, prompt, max_length=512, temperature=0.7, top_p=0.95, top_k=50):
+    def generate_response(self, prompt, max_length=512, temperature=0.7, top_p=0.95, top_k=50,
+                          deadline_s=None, on_queue_position=None, on_token=None):
+        """
+        Genera passando dallo scheduler: aspetta il proprio turno e chiama
+        on_queue_position(posizione) finché è in coda, poi con 0 quando parte.
+        Con on_token riceve i pezzi di testo man mano che vengono generati;
+        il valore restituito resta la risposta completa.
+
+        Raises:
+            CodaPiena: Se ci sono già troppe generazioni in attesa
+            ScadenzaSuperata: Se la scadenza passa prima che arrivi il turno
+        """
         if not self.model or not self.tokenizer:
             return "Modello non caricato"
         
+        prenotazione = self.scheduler.prenota(deadline_s if deadline_s is not None else self.deadline_s)
+        try:
+            queued = False
+            while not prenotazione.attendi(timeout=0.5):
+                queued = True
+                if on_queue_position:
+                    on_queue_position(prenotazione.posizione)
+            if queued and on_queue_position:
+                on_queue_position(0)
+            return self._generate(prompt, max_length, temperature, top_p, top_k, prenotazione.tempo_rimasto(),
+                                  on_token)
+        finally:
+            prenotazione.rilascia()
+    
+    def _generate(self, prompt, max_length, temperature, top_p, top_k, max_time, on_token=None):
         try:
             input_ids = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=2048).input_ids
             
@@ -339,6 +461,8 @@ class ModelManager:
                     top_k=top_k,
                     pad_token_id=self.tokenizer.eos_token_id,
                     use_cache=True,  # Usa la cache per velocizzare
+                    max_time=max_time,  # Alla scadenza restituisce quanto generato finora
+                    streamer=CallbackStreamer(self.tokenizer, on_token) if on_token else None,
                 )
             
             # Decodifica solo la nuova parte generata
@@ -361,6 +485,9 @@ class ModelManager:
             torch.cuda.empty_cache()
 
 class ChatApplication:
+    # Frequenza di aggiornamento della risposta in streaming (~30 fps)
+    STREAM_FRAME_MS = 33
+    
     def __init__(self, root):
         self.root = root
         self.root.title("Chat con AI - ChatML Support")
@@ -370,6 +497,7 @@ class ChatApplication:
         self.model_manager = ModelManager()
         self.system_monitor = SystemMonitor()
         self.current_thread_id = None
+        self.conversation_loads = 0
         self.templates = ChatMLTemplates.get_templates()  # Corretto il nome della classe
         self.is_closing = False
         
@@ -615,6 +743,7 @@ class ChatApplication:
             return
         
         messages = self.db.get_messages(self.current_thread_id)
+        self.conversation_loads += 1
         self.chat_area.config(state=tk.NORMAL)
         self.chat_area.delete(1.0, tk.END)
         
@@ -626,7 +755,13 @@ class ChatApplication:
     
     def display_message(self, role, content, timestamp=None):
         self.chat_area.config(state=tk.NORMAL)
-        
+        self.insert_label(role, timestamp)
+        self.chat_area.insert(tk.END, f"{content}\n\n")
+        self.chat_area.config(state=tk.DISABLED)
+        self.chat_area.see(tk.END)
+    
+    def insert_label(self, role, timestamp=None):
+        """Inserisce l'intestazione del messaggio; chat_area deve essere in stato NORMAL"""
         if timestamp:
             time_str = timestamp[:19]  # YYYY-MM-DD HH:MM:SS
         else:
@@ -640,15 +775,10 @@ class ChatApplication:
         elif role == "system":
             self.chat_area.insert(tk.END, f"[{time_str}] Sistema: ", "system_label")
         
-        self.chat_area.insert(tk.END, f"{content}\n\n")
-        
         # Configurazione tag per colori
         self.chat_area.tag_config("user_label", foreground="blue")
         self.chat_area.tag_config("ai_label", foreground="green")
         self.chat_area.tag_config("system_label", foreground="red")
-        
-        self.chat_area.config(state=tk.DISABLED)
-        self.chat_area.see(tk.END)
     
     def format_conversation_with_template(self, messages, template_name):
         template = self.templates[template_name]
@@ -683,11 +813,14 @@ class ChatApplication:
         threading.Thread(target=self.generate_response, daemon=True).start()
     
     def generate_response(self):
+        # Il thread attivo può cambiare mentre la richiesta è in coda
+        thread_id = self.current_thread_id
+        stream = StreamingMessage(self, thread_id, self.STREAM_FRAME_MS)
         try:
             self.status_var.set("Generando risposta...")
             
             # Ottieni tutti i messaggi del thread
-            messages = self.db.get_messages(self.current_thread_id)
+            messages = self.db.get_messages(thread_id)
             
             # Converti in formato per il template
             conversation = []
@@ -704,16 +837,25 @@ class ChatApplication:
             # Formatta con template
             prompt = self.format_conversation_with_template(conversation, self.template_var.get())
             
-            # Genera risposta
-            response = self.model_manager.generate_response(prompt)
+            def queue_position(position):
+                text = f"In coda: posizione {position}" if position else "Generando risposta..."
+                self.root.after(0, lambda: self.status_var.set(text))
+            
+            # Genera risposta, mostrandola man mano che arrivano i token
+            self.root.after(0, stream.start)
+            response = self.model_manager.generate_response(prompt, on_queue_position=queue_position,
+                                                            on_token=stream.put)
             
-            # Aggiungi risposta al database e visualizza
-            self.db.add_message(self.current_thread_id, "assistant", response)
-            self.root.after(0, lambda: self.display_message("assistant", response))
+            # Salva la risposta completa e chiude il messaggio in streaming
+            self.db.add_message(thread_id, "assistant", response)
+            self.root.after(0, lambda: stream.finish(response))
             self.root.after(0, lambda: self.status_var.set("Pronto"))
             
         except Exception as e:
-            self.root.after(0, lambda: self.status_var.set(f"Errore: {str(e)}"))
+            self.root.after(0, stream.finish)
+            # e viene cancellata all'uscita dall'except: la lambda deve catturare solo il messaggio
+            msg = f"Errore: {e}"
+            self.root.after(0, lambda: self.status_var.set(msg))
     
     def load_model(self):
         model_name = self.model_var.get().strip()
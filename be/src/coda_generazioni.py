@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Controllo d'accesso alle generazioni del modello linguistico.
+
+Su CPU due model.generate contemporanei si contendono i core e rallentano
+entrambi, quindi le generazioni passano da uno scheduler: al più
+`concorrenza` alla volta, le altre in una coda FIFO limitata. Chi arriva
+a coda piena viene rifiutato subito (CodaPiena) invece di allungare la
+coda di tutti; chi aspetta conosce la sua posizione e ha una scadenza,
+superata la quale esce dalla coda (ScadenzaSuperata). Il tempo che resta
+alla scadenza si può passare a model.generate come max_time.
+"""
+
+import threading
+import time
+from collections import deque
+
+CONCORRENZA = 1
+CODA_MAX = 8
+
+
+class CodaPiena(Exception):
+    pass
+
+
+class ScadenzaSuperata(Exception):
+    pass
+
+
+class Prenotazione:
+    def __init__(self, scheduler, scadenza):
+        self.scheduler = scheduler
+        # Istante (time.monotonic()) oltre il quale la richiesta non serve più, o None
+        self.scadenza = scadenza
+        self.ammessa = False
+        self.rilasciata = False
+
+    @property
+    def posizione(self):
+        """0 se la generazione è ammessa, altrimenti la posizione in coda a partire da 1."""
+        return self.scheduler._posizione(self)
+
+    def tempo_rimasto(self):
+        if self.scadenza is None:
+            return None
+        return max(0.0, self.scadenza - time.monotonic())
+
+    def attendi(self, timeout=None):
+        """
+        Attende il proprio turno per al più timeout secondi.
+
+        Returns:
+            True se la generazione è ammessa, False se il timeout scade prima
+
+        Raises:
+            ScadenzaSuperata: Se la scadenza della richiesta passa mentre è in coda
+        """
+        return self.scheduler._attendi(self, timeout)
+
+    def rilascia(self):
+        """Libera il posto (in esecuzione o in coda); si può chiamare più volte."""
+        self.scheduler._rilascia(self)
+
+    def __enter__(self):
+        self.attendi()
+        return self
+
+    def __exit__(self, *args):
+        self.rilascia()
+
+
+class SchedulerGenerazioni:
+    def __init__(self, concorrenza=CONCORRENZA, coda_max=CODA_MAX):
+        self.concorrenza = concorrenza
+        self.coda_max = coda_max
+        self.in_esecuzione = 0
+        self.attesa = deque()
+        self.condizione = threading.Condition()
+        self.rifiutate = 0
+        self.scadute = 0
+
+    def prenota(self, scadenza_s=None):
+        """
+        Mette in coda una generazione.
+
+        Args:
+            scadenza_s: Secondi entro cui la generazione deve finire, o None
+
+        Raises:
+            CodaPiena: Se la coda ha già coda_max richieste in attesa
+        """
+        scadenza = time.monotonic() + scadenza_s if scadenza_s is not None else None
+        prenotazione = Prenotazione(self, scadenza)
+        with self.condizione:
+            if len(self.attesa) >= self.coda_max and self.in_esecuzione >= self.concorrenza:
+                self.rifiutate += 1
+                raise CodaPiena(f"Coda piena: {len(self.attesa)} generazioni in attesa")
+            self.attesa.append(prenotazione)
+            self._ammetti()
+        return prenotazione
+
+    def _ammetti(self):
+        while self.attesa and self.in_esecuzione < self.concorrenza:
+            prenotazione = self.attesa.popleft()
+            prenotazione.ammessa = True
+            self.in_esecuzione += 1
+        self.condizione.notify_all()
+
+    def _posizione(self, prenotazione):
+        with self.condizione:
+            if prenotazione.ammessa:
+                return 0
+            try:
+                return self.attesa.index(prenotazione) + 1
+            except ValueError:
+                return None
+
+    def _attendi(self, prenotazione, timeout):
+        limite = time.monotonic() + timeout if timeout is not None else None
+        with self.condizione:
+            while not prenotazione.ammessa:
+                if prenotazione.rilasciata:
+                    return False
+                adesso = time.monotonic()
+                if prenotazione.scadenza is not None and adesso >= prenotazione.scadenza:
+                    self.attesa.remove(prenotazione)
+                    prenotazione.rilasciata = True
+                    self.scadute += 1
+                    raise ScadenzaSuperata("Scadenza superata in coda")
+                if limite is not None and adesso >= limite:
+                    return False
+                attese = [t - adesso for t in (limite, prenotazione.scadenza) if t is not None]
+                self.condizione.wait(min(attese) if attese else None)
+            return True
+
+    def _rilascia(self, prenotazione):
+        with self.condizione:
+            if prenotazione.rilasciata:
+                return
+            prenotazione.rilasciata = True
+            if prenotazione.ammessa:
+                self.in_esecuzione -= 1
+            else:
+                self.attesa.remove(prenotazione)
+            self._ammetti()
+
+    def get_current_stats(self):
+        with self.condizione:
+            return {
+                "in_esecuzione": self.in_esecuzione,
+                "in_coda": len(self.attesa),
+                "rifiutate": self.rifiutate,
+                "scadute": self.scadute,
+            }
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Codifiche compatte per le risposte dell'API.
+
+Oltre al JSON (serializzato con orjson se installato, altrimenti con
+l'ujson incluso in srsly) le risposte si possono chiedere in MessagePack.
+I risultati ELS di un libro intero contengono centinaia di migliaia di
+liste di indici: con indici="compatti" ogni lista diventa un array di
+interi impacchettato, con le differenze tra indici consecutivi (piccole,
+vicine al salto) codificate come varint zigzag. Il pacco è
+{"n": numero di indici, "varint": byte}; in JSON i byte sono in base64.
+"""
+
+import base64
+
+import numpy as np
+import srsly
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FORMATI = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+}
+TIPI_MSGPACK = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# Campi dei risultati ELS che sono liste piatte di indici
+CAMPI_INDICI = ("indici_saltatoria", "indici_semantici")
+
+# Valori da cui una varint passa da k a k + 1 byte
+SOGLIE_VARINT = np.array([1 << (7 * k) for k in range(1, 10)], dtype=np.uint64)
+
+
+def negozia(accept, formato=None):
+    """Sceglie il formato dal parametro esplicito o, in sua assenza, dall'header Accept."""
+    if formato:
+        return formato
+    if accept and any(tipo in accept for tipo in TIPI_MSGPACK):
+        return "msgpack"
+    return "json"
+
+
+def json_bytes(oggetto):
+    if orjson is not None:
+        return orjson.dumps(oggetto)
+    return srsly.json_dumps(oggetto).encode("utf-8")
+
+
+def codifica(oggetto, formato="json"):
+    """Serializza oggetto nel formato richiesto ("json" o "msgpack") e restituisce i byte."""
+    if formato == "msgpack":
+        return srsly.msgpack_dumps(oggetto)
+    return json_bytes(oggetto)
+
+
+def decodifica(corpo, formato="json"):
+    if formato == "msgpack":
+        return srsly.msgpack_loads(corpo)
+    return orjson.loads(corpo) if orjson is not None else srsly.json_loads(corpo)
+
+
+def comprimi_indici(indici, binario=True):
+    """
+    Impacchetta una lista di interi: differenze con il precedente, zigzag
+    (così le differenze negative restano piccole) e varint LEB128, 7 bit per byte.
+    """
+    valori = np.asarray(indici, dtype=np.int64)
+    differenze = np.diff(valori, prepend=0)
+    zigzag = ((differenze << 1) ^ (differenze >> 63)).astype(np.uint64)
+    # Numero di gruppi da 7 bit di ogni valore (almeno uno, anche per lo zero)
+    lunghezze = np.searchsorted(SOGLIE_VARINT, zigzag, side="right") + 1
+    gruppi = int(lunghezze.max()) if len(lunghezze) else 1
+    colonne = np.arange(gruppi)
+    matrice = ((zigzag[:, None] >> (7 * colonne).astype(np.uint64)) & np.uint64(0x7F)).astype(np.uint8)
+    # Bit di continuazione su tutti i byte tranne l'ultimo di ogni valore
+    matrice |= np.where(colonne < (lunghezze - 1)[:, None], 0x80, 0).astype(np.uint8)
+    dati = matrice[colonne < lunghezze[:, None]].tobytes()
+    return {"n": len(valori), "varint": dati if binario else base64.b64encode(dati).decode("ascii")}
+
+
+def decomprimi_indici(pacco):
+    """Inverso di comprimi_indici; accetta i byte sia grezzi sia in base64."""
+    dati = pacco["varint"]
+    if isinstance(dati, str):
+        dati = base64.b64decode(dati)
+    byte = np.frombuffer(dati, dtype=np.uint8)
+    if not len(byte):
+        return []
+    fine = (byte & 0x80) == 0
+    inizi = np.flatnonzero(np.concatenate(([True], fine[:-1])))
+    # Posizione di ogni byte all'interno del suo valore
+    posizione = np.arange(len(byte)) - np.repeat(inizi, np.diff(np.append(inizi, len(byte))))
+    contributi = (byte & 0x7F).astype(np.uint64) << (7 * posizione).astype(np.uint64)
+    zigzag = np.add.reduceat(contributi, inizi)
+    differenze = (zigzag >> np.uint64(1)).astype(np.int64) ^ -(zigzag & np.uint64(1)).astype(np.int64)
+    return np.cumsum(differenze).tolist()
+
+
+def compatta_els(risultati_estesi, binario=True):
+    """
+    Sostituisce le liste di indici dei risultati ELS con array impacchettati.
+
+    dettagli_semantici ({parola: [(salto, posizione, indici), ...]}) diventa colonnare:
+    parole, numero di occorrenze per parola, salti, posizioni, lunghezze delle liste
+    di indici e tutti gli indici concatenati, ciascuno impacchettato.
+    """
+    compatti = {}
+    for titolo, sezione in risultati_estesi.items():
+        sezione = dict(sezione)
+        for campo in CAMPI_INDICI:
+            if campo in sezione:
+                sezione[campo] = comprimi_indici(sezione[campo], binario)
+        if "dettagli_semantici" in sezione:
+            dettagli = sezione["dettagli_semantici"]
+            occorrenze = [occorrenza for lista in dettagli.values() for occorrenza in lista]
+            indici = [indice for _, _, lista in occorrenze for indice in lista]
+            sezione["dettagli_semantici"] = {
+                "parole": list(dettagli),
+                "occorrenze": comprimi_indici([len(lista) for lista in dettagli.values()], binario),
+                "salti": comprimi_indici([salto for salto, _, _ in occorrenze], binario),
+                "posizioni": comprimi_indici([posizione for _, posizione, _ in occorrenze], binario),
+                "lunghezze": comprimi_indici([len(lista) for _, _, lista in occorrenze], binario),
+                "indici": comprimi_indici(indici, binario),
+            }
+        compatti[titolo] = sezione
+    return compatti
+
+
+def espandi_els(compatti):
+    """Inverso di compatta_els."""
+    risultati_estesi = {}
+    for titolo, sezione in compatti.items():
+        sezione = dict(sezione)
+        for campo in CAMPI_INDICI:
+            if campo in sezione:
+                sezione[campo] = decomprimi_indici(sezione[campo])
+        if "dettagli_semantici" in sezione:
+            colonne = sezione["dettagli_semantici"]
+            salti = decomprimi_indici(colonne["salti"])
+            posizioni = decomprimi_indici(colonne["posizioni"])
+            indici = decomprimi_indici(colonne["indici"])
+            occorrenze = []
+            inizio = 0
+            for salto, posizione, lunghezza in zip(salti, posizioni, decomprimi_indici(colonne["lunghezze"])):
+                occorrenze.append([salto, posizione, indici[inizio:inizio + lunghezza]])
+                inizio += lunghezza
+            dettagli = {}
+            inizio = 0
+            for parola, numero in zip(colonne["parole"], decomprimi_indici(colonne["occorrenze"])):
+                dettagli[parola] = occorrenze[inizio:inizio + numero]
+                inizio += numero
+            sezione["dettagli_semantici"] = dettagli
+        risultati_estesi[titolo] = sezione
+    return risultati_estesi
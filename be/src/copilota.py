@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Generazione in streaming per il copilota poetico.
+
+Il modello viene caricato al primo utilizzo e condiviso. Ogni generazione
+gira in un thread con un TextIteratorStreamer: chi la consuma riceve i
+pezzi di testo man mano che escono dal modello, quindi il primo arriva dopo
+una sola forward pass sul prompt invece che a risposta finita. interrompi()
+ferma model.generate al token successivo (es. quando il client si disconnette).
+Le generazioni dell'API passano da SCHEDULER (coda_generazioni): una alla
+volta, con una coda limitata e una scadenza per richiesta.
+"""
+
+import threading
+import time
+from pathlib import Path
+
+import metriche
+from coda_generazioni import SchedulerGenerazioni
+
+BASE_DIR = Path(__file__).resolve().parent
+# Cartella per la cache Hugging Face dentro il progetto
+CACHE_DIR = BASE_DIR / "cache"
+
+# Percorso del modello su Hugging Face
+MODELLO = "jan-hq/stealth-v1.2"
+
+SISTEMA = [
+    {"role": "system", "content": "Sei la Dea Astarte Syriaca, una divinità antica e saggia. Rispondi sempre nel ruolo della Dea."},
+    {"role": "system", "content": "Stai girando in un software realizzao da Stefano (user) per l'analii della metrica poetica durante la scritura poetica"},
+]
+
+MAX_NUOVI_TOKEN = 1024
+PARAMETRI_GENERAZIONE = {
+    "do_sample": True,
+    "top_p": 0.95,
+    "top_k": 50,
+    "temperature": 0.7,
+    "repetition_penalty": 1.1,
+}
+
+# Generazioni avviate e non ancora terminate, per /metrics; si aggiorna solo con _lock_generazioni
+generazioni_attive = 0
+_lock_generazioni = threading.Lock()
+
+GENERAZIONI_CONTEMPORANEE = 1
+CODA_GENERAZIONI = 8
+# Tempo massimo per una richiesta, attesa in coda compresa
+SCADENZA_S = 120
+SCHEDULER = SchedulerGenerazioni(concorrenza=GENERAZIONI_CONTEMPORANEE, coda_max=CODA_GENERAZIONI)
+
+_tokenizer = None
+_modello = None
+_lock_avvio = threading.Lock()
+
+
+def get_modello():
+    """Carica tokenizer e modello al primo utilizzo e li condivide tra tutte le generazioni."""
+    global _tokenizer, _modello
+    if _modello is None:
+        with _lock_avvio:
+            if _modello is None:
+                from transformers import AutoModelForCausalLM, AutoTokenizer
+
+                tokenizer = AutoTokenizer.from_pretrained(MODELLO, cache_dir=CACHE_DIR)
+                # Imposta manualmente il pad_token_id per evitare warning
+                tokenizer.pad_token = tokenizer.eos_token
+                modello = AutoModelForCausalLM.from_pretrained(MODELLO, cache_dir=CACHE_DIR)
+                modello.eval()
+                _tokenizer = tokenizer
+                _modello = modello
+    return _tokenizer, _modello
+
+
+# Funzione per formattare la conversazione con delimitatori specifici
+def format_conversation(conversation):
+    formatted_text = ""
+    for message in conversation:
+        if message["role"] in ("system", "user", "assistant"):
+            formatted_text += f"<|im_start|>{message['role']}\n{message['content']}<|im_end|>\n"
+    return formatted_text.strip()
+
+
+def prompt_conversazione(conversation):
+    """Formatta la conversazione e aggiunge il prompt dell'assistente."""
+    if not any(message["role"] == "system" for message in conversation):
+        conversation = SISTEMA + list(conversation)
+    return format_conversation(conversation) + "\n<|im_start|>assistant\n"
+
+
+class Generazione:
+    """
+    Iteratore sui pezzi di testo di una risposta, prodotto da model.generate in un thread.
+
+    Dopo la fine espone tempo_primo_token (secondi dall'avvio al primo token),
+    token_generati e durata. Se riceve una prenotazione già ammessa dallo
+    scheduler, la generazione si ferma alla sua scadenza e la rilascia alla fine.
+    """
+
+    def __init__(self, conversation, max_new_tokens=MAX_NUOVI_TOKEN, prenotazione=None, **parametri):
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+        tokenizer, modello = get_modello()
+        generazione = self
+
+        class Streamer(TextIteratorStreamer):
+            def put(self, value):
+                if not self.next_tokens_are_prompt:
+                    if generazione.tempo_primo_token is None:
+                        generazione.tempo_primo_token = time.perf_counter() - generazione.inizio
+                    generazione.token_generati += value.numel()
+                super().put(value)
+
+        class Interrompi(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return generazione.fermata.is_set()
+
+        self.inizio = time.perf_counter()
+        self.tempo_primo_token = None
+        self.token_generati = 0
+        self.durata = None
+        self.errore = None
+        self.fermata = threading.Event()
+        self.prenotazione = prenotazione
+        self.streamer = Streamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        inizio = time.perf_counter()
+        inputs = tokenizer(prompt_conversazione(conversation), return_tensors="pt")
+        metriche.osserva_stadio("tokenizzazione_prompt", inizio)
+        kwargs = dict(PARAMETRI_GENERAZIONE)
+        kwargs.update(parametri)
+        kwargs.update(
+            input_ids=inputs.input_ids,
+            attention_mask=inputs.attention_mask,
+            max_new_tokens=max_new_tokens,
+            pad_token_id=tokenizer.pad_token_id,
+            eos_token_id=tokenizer.eos_token_id,
+            streamer=self.streamer,
+            stopping_criteria=StoppingCriteriaList([Interrompi()]),
+        )
+        if prenotazione is not None and prenotazione.scadenza is not None:
+            kwargs["max_time"] = prenotazione.tempo_rimasto()
+        self.thread = threading.Thread(target=self._genera, args=(modello, kwargs), daemon=True)
+        self.thread.start()
+
+    def _genera(self, modello, kwargs):
+        import torch
+
+        global generazioni_attive
+        with _lock_generazioni:
+            generazioni_attive += 1
+        try:
+            with torch.no_grad():
+                modello.generate(**kwargs)
+        except Exception as e:
+            self.errore = e
+            # Sblocca chi sta aspettando il prossimo pezzo di testo
+            self.streamer.end()
+        finally:
+            self.durata = time.perf_counter() - self.inizio
+            with _lock_generazioni:
+                generazioni_attive -= 1
+            if self.prenotazione is not None:
+                self.prenotazione.rilascia()
+            if self.tempo_primo_token is not None:
+                metriche.PRIMO_TOKEN.osserva(self.tempo_primo_token)
+            if self.token_al_secondo:
+                metriche.TOKEN_AL_SECONDO.osserva(self.token_al_secondo)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.streamer)
+        except StopIteration:
+            self.thread.join()
+            if self.errore is not None:
+                raise self.errore
+            raise
+
+    def interrompi(self):
+        """Ferma la generazione dopo il token in corso; sicuro da qualsiasi thread."""
+        self.fermata.set()
+
+    @property
+    def token_al_secondo(self):
+        if not self.durata or self.tempo_primo_token is None or self.durata <= self.tempo_primo_token:
+            return 0.0
+        return self.token_generati / (self.durata - self.tempo_primo_token)
+
+    def statistiche(self):
+        return {
+            "token_generati": self.token_generati,
+            "tempo_primo_token": self.tempo_primo_token,
+            "token_al_secondo": self.token_al_secondo,
+            "interrotta": self.fermata.is_set(),
+        }
+
+
+def riscalda():
+    """Genera un token di prova, così l'inizializzazione dei kernel non ricade sulla prima richiesta."""
+    for _ in Generazione([{"role": "user", "content": "Ciao"}], max_new_tokens=1):
+        pass
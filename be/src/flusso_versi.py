@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Sorgenti di versi lette in modo pigro, una riga alla volta.
+
+Ogni sorgente restituisce un generatore di tuple (numero_riga, verso), così
+l'analisi di corpora molto grandi non richiede di caricare il testo in memoria.
+"""
+
+from html.parser import HTMLParser
+from pathlib import Path
+
+DIMENSIONE_BLOCCO = 64 * 1024
+
+# Elementi HTML che chiudono una riga di testo
+TAG_BLOCCO = {"p", "br", "div", "li", "h1", "h2", "h3", "h4", "h5", "h6", "tr"}
+TAG_IGNORATI = {"style", "script", "head", "title"}
+
+
+def versi_da_righe(righe):
+    """Numera le righe di un iterabile qualsiasi (file aperto, lista, generatore)."""
+    for numero, riga in enumerate(righe, start=1):
+        yield numero, riga.rstrip("\r\n")
+
+
+def versi_da_file(percorso_file, encoding="utf-8"):
+    with open(percorso_file, "r", encoding=encoding) as f:
+        yield from versi_da_righe(f)
+
+
+class _EstrattoreRighe(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.riga_corrente = []
+        self.righe_pronte = []
+        self.profondita_ignorata = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in TAG_IGNORATI:
+            self.profondita_ignorata += 1
+        elif tag in TAG_BLOCCO:
+            self._chiudi_riga()
+
+    def handle_endtag(self, tag):
+        if tag in TAG_IGNORATI:
+            self.profondita_ignorata = max(0, self.profondita_ignorata - 1)
+        elif tag in TAG_BLOCCO:
+            self._chiudi_riga()
+
+    def handle_data(self, data):
+        if not self.profondita_ignorata:
+            self.riga_corrente.append(data)
+
+    def _chiudi_riga(self):
+        if self.riga_corrente:
+            self.righe_pronte.append(" ".join("".join(self.riga_corrente).split()))
+            self.riga_corrente = []
+
+
+def versi_da_html(percorso_file, encoding="utf-8"):
+    """
+    Estrae il testo da un file HTML (es. books/*.html esportati da Google Docs)
+    leggendolo a blocchi: ogni paragrafo o <br> diventa una riga.
+    """
+    estrattore = _EstrattoreRighe()
+    numero = 0
+    with open(percorso_file, "r", encoding=encoding) as f:
+        while True:
+            blocco = f.read(DIMENSIONE_BLOCCO)
+            if not blocco:
+                break
+            estrattore.feed(blocco)
+            for riga in estrattore.righe_pronte:
+                numero += 1
+                yield numero, riga
+            estrattore.righe_pronte = []
+    estrattore.close()
+    estrattore._chiudi_riga()
+    for riga in estrattore.righe_pronte:
+        numero += 1
+        yield numero, riga
+
+
+def apri_sorgente(sorgente):
+    """
+    Restituisce un generatore di (numero_riga, verso) per un percorso (.txt o .html),
+    un file già aperto o un qualsiasi iterabile di stringhe.
+    """
+    if isinstance(sorgente, (str, Path)):
+        if Path(sorgente).suffix.lower() in (".html", ".htm"):
+            return versi_da_html(sorgente)
+        return versi_da_file(sorgente)
+    return versi_da_righe(sorgente)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lavori in background per le analisi ELS di pdf-semantic-extraction.py.
+
+Un documento inviato diventa un lavoro con un id: l'analisi gira in un pool
+di processi (al massimo LAVORI_MAX alla volta, le altre in coda fino a
+CODA_MAX) e aggiorna un dizionario condiviso con le pagine lette e le
+parole cercate per i salti. I risultati (JSON e HTML) vengono scritti nella
+cartella dei lavori e restano disponibili finché il lavoro non viene
+eliminato o, al più tardi, per DURATA_RISULTATI secondi dalla fine: i lavori
+scaduti si eliminano all'invio di un lavoro nuovo. Il worker salva i risultati in MessagePack; le varianti JSON e
+con indici compatti (codifica_risposte) si creano dal file MessagePack alla
+prima richiesta e poi restano su disco. Un lavoro si può annullare: se è ancora in coda non parte, se è
+in corso si ferma al successivo aggiornamento di progresso.
+"""
+
+import importlib.util
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from pathlib import Path
+
+import metriche
+from codifica_risposte import codifica, compatta_els, decodifica
+
+SCRIPT_ESTRAZIONE = Path(__file__).resolve().parent / "pdf-semantic-extraction.py"
+CARTELLA_LAVORI = Path(__file__).resolve().parent / "lavori_els"
+
+LAVORI_MAX = 2
+CODA_MAX = 16
+# Secondi per cui un lavoro terminato resta consultabile prima di essere eliminato
+DURATA_RISULTATI = 24 * 3600
+
+IN_CODA = "in_coda"
+IN_CORSO = "in_corso"
+COMPLETATO = "completato"
+ANNULLATO = "annullato"
+ERRORE = "errore"
+
+
+class LavoroAnnullato(Exception):
+    pass
+
+
+class CodaPiena(Exception):
+    pass
+
+
+_modulo = None
+
+
+def _modulo_estrazione():
+    """Carica pdf-semantic-extraction.py (il nome con il trattino non si può importare) una volta per processo."""
+    global _modulo
+    if _modulo is None:
+        spec = importlib.util.spec_from_file_location("estrazione_pdf", SCRIPT_ESTRAZIONE)
+        modulo = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(modulo)
+        _modulo = modulo
+    return _modulo
+
+
+def _esegui(cartella, salto, stato, annulla):
+    """Corpo del lavoro, eseguito in un processo del pool."""
+    if annulla.is_set():
+        raise LavoroAnnullato()
+    stato["stato"] = IN_CORSO
+    stato["iniziato"] = time.time()
+
+    def progresso(fase, fatti, totale):
+        if annulla.is_set():
+            raise LavoroAnnullato()
+        stato[fase] = {"fatti": fatti, "totale": totale}
+
+    estrazione = _modulo_estrazione()
+    cartella = Path(cartella)
+    inizio = time.perf_counter()
+    try:
+        paragrafi, _, risultati_estesi = estrazione.analizza_documento(str(cartella / "documento.pdf"), salto, progresso)
+    except SystemExit:
+        # leggi_pdf intercetta ogni eccezione, compreso l'annullamento, ed esce dal programma
+        if annulla.is_set():
+            raise LavoroAnnullato()
+        raise RuntimeError("Errore nella lettura del file PDF")
+    durate = {"ricerca_els": time.perf_counter() - inizio}
+
+    (cartella / "risultati.msgpack").write_bytes(codifica(risultati_estesi, "msgpack"))
+    inizio = time.perf_counter()
+    with open(cartella / "risultati.html", "w", encoding="utf-8") as f:
+        f.write(estrazione.crea_output_html(paragrafi, risultati_estesi))
+    durate["render_html"] = time.perf_counter() - inizio
+    os.remove(cartella / "documento.pdf")
+    # Le metriche vivono nel processo principale: il worker restituisce solo le durate
+    return durate
+
+
+class GestoreLavori:
+    def __init__(self, cartella=CARTELLA_LAVORI, lavori_max=LAVORI_MAX, coda_max=CODA_MAX,
+                 durata_risultati=DURATA_RISULTATI):
+        self.cartella = Path(cartella)
+        self.lavori_max = lavori_max
+        self.coda_max = coda_max
+        self.durata_risultati = durata_risultati
+        self.lavori = {}
+        self.pool = None
+        self.manager = None
+        self.lock = threading.Lock()
+        self.lock_varianti = threading.Lock()
+
+    def _avvia(self):
+        if self.pool is None:
+            # spawn: il server ha thread attivi (batcher, copilota) e un fork li copierebbe a metà
+            ctx = multiprocessing.get_context("spawn")
+            self.manager = ctx.Manager()
+            self.pool = ProcessPoolExecutor(max_workers=self.lavori_max, mp_context=ctx)
+
+    def attivi(self):
+        return sum(1 for lavoro in self.lavori.values() if not lavoro["futuro"].done())
+
+    def get_current_stats(self):
+        """Numero di lavori per stato."""
+        conteggi = dict.fromkeys((IN_CODA, IN_CORSO, COMPLETATO, ANNULLATO, ERRORE), 0)
+        for lavoro in list(self.lavori.values()):
+            conteggi[lavoro["stato"].get("stato", IN_CODA)] += 1
+        return conteggi
+
+    def invia(self, pdf, salto):
+        """
+        Args:
+            pdf: Contenuto del file PDF (bytes)
+            salto: Il passo dell'estrazione
+
+        Returns:
+            L'id del lavoro
+
+        Raises:
+            CodaPiena: Se ci sono già lavori_max + coda_max lavori non terminati
+        """
+        self.elimina_scaduti()
+        with self.lock:
+            if self.attivi() >= self.lavori_max + self.coda_max:
+                raise CodaPiena()
+            self._avvia()
+            id_lavoro = uuid.uuid4().hex
+            cartella = self.cartella / id_lavoro
+            cartella.mkdir(parents=True)
+            (cartella / "documento.pdf").write_bytes(pdf)
+
+            stato = self.manager.dict(stato=IN_CODA, creato=time.time(), salto=salto)
+            annulla = self.manager.Event()
+            futuro = self.pool.submit(_esegui, str(cartella), salto, stato, annulla)
+            self.lavori[id_lavoro] = {"stato": stato, "annulla": annulla, "futuro": futuro, "cartella": cartella}
+        futuro.add_done_callback(lambda f: self._concluso(stato, f))
+        return id_lavoro
+
+    def _concluso(self, stato, futuro):
+        try:
+            for nome, durata in futuro.result().items():
+                metriche.stadio(nome).osserva(durata)
+            stato["stato"] = COMPLETATO
+        except (CancelledError, LavoroAnnullato):
+            stato["stato"] = ANNULLATO
+        except Exception as e:
+            stato["stato"] = ERRORE
+            stato["errore"] = str(e) or type(e).__name__
+        stato["finito"] = time.time()
+
+    def stato(self, id_lavoro):
+        """Restituisce lo stato del lavoro come dizionario, o None se non esiste."""
+        lavoro = self.lavori.get(id_lavoro)
+        if lavoro is None:
+            return None
+        return {"id": id_lavoro, **dict(lavoro["stato"])}
+
+    def risultato(self, id_lavoro, formato="json", indici="liste"):
+        """
+        Percorso del file dei risultati, o None se il lavoro non è completato.
+
+        Args:
+            formato: "json", "msgpack" o "html"
+            indici: "liste" o "compatti" (array impacchettati, vedi codifica_risposte.compatta_els)
+        """
+        lavoro = self.lavori.get(id_lavoro)
+        if lavoro is None or lavoro["stato"]["stato"] != COMPLETATO:
+            return None
+        cartella = lavoro["cartella"]
+        if formato == "html" or (formato == "msgpack" and indici == "liste"):
+            return cartella / f"risultati.{formato}"
+
+        percorso = cartella / f"risultati{'_compatti' if indici == 'compatti' else ''}.{formato}"
+        with self.lock_varianti:
+            if not percorso.exists():
+                inizio = time.perf_counter()
+                risultati_estesi = decodifica((cartella / "risultati.msgpack").read_bytes(), "msgpack")
+                if indici == "compatti":
+                    risultati_estesi = compatta_els(risultati_estesi, binario=formato == "msgpack")
+                provvisorio = percorso.with_suffix(".tmp")
+                provvisorio.write_bytes(codifica(risultati_estesi, formato))
+                os.replace(provvisorio, percorso)
+                metriche.osserva_stadio("codifica_risultati", inizio)
+        return percorso
+
+    def annulla(self, id_lavoro):
+        """Annulla un lavoro non terminato; restituisce False se il lavoro non esiste."""
+        lavoro = self.lavori.get(id_lavoro)
+        if lavoro is None:
+            return False
+        if not lavoro["futuro"].cancel():
+            lavoro["annulla"].set()
+            if not lavoro["futuro"].done():
+                lavoro["stato"]["annullamento_richiesto"] = True
+        return True
+
+    def elimina(self, id_lavoro):
+        """Annulla il lavoro se serve e ne cancella i file; restituisce False se non esiste."""
+        with self.lock:
+            lavoro = self.lavori.pop(id_lavoro, None)
+        if lavoro is None:
+            return False
+        if not lavoro["futuro"].done():
+            if not lavoro["futuro"].cancel():
+                lavoro["annulla"].set()
+                # Il worker scrive nella cartella finché non si accorge dell'annullamento
+                lavoro["futuro"].add_done_callback(lambda f: shutil.rmtree(lavoro["cartella"], ignore_errors=True))
+                return True
+        shutil.rmtree(lavoro["cartella"], ignore_errors=True)
+        return True
+
+    def elimina_scaduti(self):
+        """
+        Elimina i lavori terminati da più di durata_risultati secondi, e le cartelle
+        altrettanto vecchie lasciate da processi precedenti (i loro lavori non sono
+        più raggiungibili). Restituisce il numero di lavori eliminati.
+        """
+        adesso = time.time()
+        with self.lock:
+            terminati = [(id_lavoro, lavoro) for id_lavoro, lavoro in self.lavori.items() if lavoro["futuro"].done()]
+        # Senza "finito" la callback di _concluso non è ancora passata: il lavoro resta
+        scaduti = [id_lavoro for id_lavoro, lavoro in terminati
+                   if adesso - lavoro["stato"].get("finito", adesso) > self.durata_risultati]
+        for id_lavoro in scaduti:
+            self.elimina(id_lavoro)
+        if self.cartella.is_dir():
+            for cartella in self.cartella.iterdir():
+                if cartella.name not in self.lavori and adesso - cartella.stat().st_mtime > self.durata_risultati:
+                    shutil.rmtree(cartella, ignore_errors=True)
+        return len(scaduti)
+
+    def chiudi(self):
+        if self.pool is not None:
+            for lavoro in self.lavori.values():
+                lavoro["annulla"].set()
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.manager.shutdown()
+            self.pool = None
+            self.manager = None
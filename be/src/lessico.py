@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lessico delle eccezioni metriche compilato e ricaricabile a caldo.
+
+La tabella `eccezioni` viene compilata in un oggetto immutabile con un numero
+di versione. Un trigger SQLite incrementa un contatore a ogni modifica della
+tabella: un processo in esecuzione controlla quel contatore e, se è cambiato,
+compila un nuovo lessico e lo sostituisce a quello corrente. Le analisi già
+avviate continuano a usare il lessico che avevano in mano.
+"""
+
+import sqlite3
+import sys
+import threading
+import time
+
+from memo_sillabe import impronta_eccezioni
+
+ECCEZIONI_INIZIALI = {
+    "mio": 2,
+    "tuo": 2,
+    "suo": 2,
+    "l'amor": 2,
+    "d'amor": 2,
+    "ch'in": 2,
+    "un'amor": 2,
+    "io": 2,
+    "l'primo": 3,
+    "ch'intrate": 3,
+    "sapïenza": 4,
+}
+
+# Incrementare quando cambia lo schema creato da init_lessico()
+VERSIONE_SCHEMA = 1
+
+
+def init_lessico(db_path, locale):
+    """
+    Crea le tabelle e i trigger del lessico. Le eccezioni iniziali vengono
+    inserite solo alla prima inizializzazione del database.
+    """
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("PRAGMA user_version")
+    if cur.fetchone()[0] >= VERSIONE_SCHEMA:
+        conn.close()
+        return
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS eccezioni (
+            parola TEXT PRIMARY KEY,
+            sillabe INTEGER,
+            locale TEXT
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS eccezioni_versione (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            versione INTEGER NOT NULL
+        )
+    """)
+    cur.execute("INSERT OR IGNORE INTO eccezioni_versione (id, versione) VALUES (0, 0)")
+    for evento in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS eccezioni_{evento.lower()}_versione
+            AFTER {evento} ON eccezioni
+            BEGIN
+                UPDATE eccezioni_versione SET versione = versione + 1 WHERE id = 0;
+            END
+        """)
+    for parola, sillabe in ECCEZIONI_INIZIALI.items():
+        cur.execute("INSERT OR IGNORE INTO eccezioni (parola, sillabe, locale) VALUES (?, ?, ?)", (parola, sillabe, locale))
+    cur.execute(f"PRAGMA user_version = {VERSIONE_SCHEMA}")
+    conn.commit()
+    conn.close()
+
+
+def versione_lessico(db_path):
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("SELECT versione FROM eccezioni_versione WHERE id = 0")
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+
+class LessicoEccezioni:
+    """Vista immutabile parola -> sillabe, con versione e impronta del contenuto."""
+    __slots__ = ("versione", "impronta", "_voci", "get")
+
+    def __init__(self, voci, versione):
+        voci = {sys.intern(parola): sillabe for parola, sillabe in voci.items()}
+        object.__setattr__(self, "_voci", voci)
+        object.__setattr__(self, "versione", versione)
+        object.__setattr__(self, "impronta", impronta_eccezioni(voci))
+        # Lookup diretto sul dict: O(1) e senza allocazioni
+        object.__setattr__(self, "get", voci.get)
+
+    def __setattr__(self, nome, valore):
+        raise AttributeError("LessicoEccezioni è immutabile")
+
+    def __contains__(self, parola):
+        return parola in self._voci
+
+    def __getitem__(self, parola):
+        return self._voci[parola]
+
+    def __len__(self):
+        return len(self._voci)
+
+    def __iter__(self):
+        return iter(self._voci)
+
+    def items(self):
+        return self._voci.items()
+
+
+def compila_lessico(db_path, locale):
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    # Lettura di versione e righe nella stessa transazione, così restano coerenti
+    cur.execute("BEGIN")
+    cur.execute("SELECT versione FROM eccezioni_versione WHERE id = 0")
+    row = cur.fetchone()
+    cur.execute("SELECT parola, sillabe FROM eccezioni WHERE locale = ?", (locale,))
+    rows = cur.fetchall()
+    conn.rollback()
+    conn.close()
+    return LessicoEccezioni({row[0]: row[1] for row in rows}, row[0] if row else 0)
+
+
+class LessicoRicaricabile:
+    """
+    Tiene il lessico corrente e lo ricompila quando la tabella `eccezioni` cambia.
+    Il controllo sul database avviene al massimo una volta ogni `intervallo` secondi.
+    """
+    def __init__(self, db_path, locale, intervallo=1.0):
+        self.db_path = db_path
+        self.locale = locale
+        self.intervallo = intervallo
+        self.lock = threading.Lock()
+        self.lessico = compila_lessico(db_path, locale)
+        self.ultimo_controllo = time.monotonic()
+
+    def corrente(self):
+        adesso = time.monotonic()
+        if adesso - self.ultimo_controllo >= self.intervallo:
+            self.ultimo_controllo = adesso
+            self.ricarica()
+        return self.lessico
+
+    def ricarica(self, forza=False):
+        """Ricompila il lessico se la versione sul database è cambiata."""
+        with self.lock:
+            if forza or versione_lessico(self.db_path) != self.lessico.versione:
+                self.lessico = compila_lessico(self.db_path, self.locale)
+        return self.lessico
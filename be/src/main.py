@@ -1,7 +1,87 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Literal
 
-app = FastAPI()
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+
+import coda_generazioni
+import copilota
+import metriche
+import server
+from avvio_motori import Motori
+from codifica_risposte import FORMATI, codifica, negozia
+from cache_risposte import CacheRisposte, chiave_risposta, corrisponde, etag, normalizza_testo
+from lavori_els import CodaPiena, GestoreLavori
+from micro_batch import MicroBatcher
+
+# Cache delle risposte di analisi; con un percorso di database sopravvive ai riavvii
+CACHE_RISPOSTE_DB = None
+cache_risposte = CacheRisposte(db_path=CACHE_RISPOSTE_DB)
+
+# Un micro-batcher per backend, così ogni blocco passa da una sola chiamata a nlp.pipe
+batcher = {
+    backend: MicroBatcher(lambda versi, backend=backend: server.analizza_blocco(versi, backend))
+    for backend in ("spacy", "regole")
+}
+
+# Scansione dal vivo: attesa dopo una modifica per accorparla alle successive, e attesa massima
+ATTESA_SCANSIONE = 0.01
+ATTESA_SCANSIONE_MAX = 0.03
+
+# Analisi ELS dei documenti, eseguite in background in un pool di processi
+lavori = GestoreLavori()
+
+# Con False il modello del copilota si carica alla prima richiesta e /readyz non lo aspetta
+PRECARICA_COPILOTA = True
+
+def carica_scansione():
+    server.get_nlp()
+    server.aggiorna_lessico()
+
+motori = Motori()
+motori.registra("scansione", carica_scansione, server.riscalda)
+if PRECARICA_COPILOTA:
+    motori.registra("copilota", copilota.get_modello, copilota.riscalda)
+
+def _hit_ratio():
+    ratio = {'cache="risposte"': cache_risposte.get_current_stats()["hit_ratio"]}
+    if server.MEMO is not None:
+        ratio['cache="memo_sillabe"'] = server.MEMO.get_current_stats()["hit_ratio"]
+    if server._cache_doc is not None:
+        ratio['cache="doc_spacy"'] = server._cache_doc.get_current_stats()["hit_ratio"]
+    return ratio
+
+metriche.registra_misura("coda_profondita", "Elementi in attesa in ciascuna coda", lambda: {
+    **{f'coda="analisi_{backend}"': b.get_current_stats()["in_coda"] for backend, b in batcher.items()},
+    'coda="lavori_els"': lavori.get_current_stats()["in_coda"],
+    'coda="copilota"': copilota.SCHEDULER.get_current_stats()["in_coda"],
+})
+metriche.registra_misura("lavori_els", "Lavori ELS per stato",
+                         lambda: {f'stato="{stato}"': n for stato, n in lavori.get_current_stats().items()})
+metriche.registra_misura("copilota_generazioni_attive", "Generazioni del copilota in corso",
+                         lambda: copilota.generazioni_attive)
+metriche.registra_misura("copilota_richieste_respinte", "Richieste al copilota rifiutate a coda piena o scadute in coda",
+                         lambda: {f'motivo="{motivo}"': copilota.SCHEDULER.get_current_stats()[motivo]
+                                  for motivo in ("rifiutate", "scadute")}, tipo="counter")
+metriche.registra_misura("micro_batch_versi_per_blocco", "Versi medi per chiamata a nlp.pipe",
+                         lambda: {f'backend="{backend}"': b.get_current_stats()["versi_per_blocco"]
+                                  for backend, b in batcher.items()})
+metriche.registra_misura("cache_hit_ratio", "Quota di richieste servite dalla cache", _hit_ratio)
+
+@asynccontextmanager
+async def lifespan(app):
+    # I motori si caricano in background: /healthz risponde subito, /readyz quando sono pronti
+    motori.avvia()
+    yield
+    for b in batcher.values():
+        await b.chiudi()
+    await asyncio.to_thread(lavori.chiudi)
+    await asyncio.to_thread(server.salva_memo)
+
+app = FastAPI(lifespan=lifespan)
 
 # Modello per il payload JSON
 class Item(BaseModel):
@@ -9,6 +89,38 @@ class Item(BaseModel):
     description: str | None = None
     price: float
 
+class RichiestaAnalisi(BaseModel):
+    versi: list[str]
+    backend: Literal["spacy", "regole"] | None = None
+
+class Messaggio(BaseModel):
+    role: Literal["system", "user", "assistant"]
+    content: str
+
+class RichiestaCopilota(BaseModel):
+    messaggi: list[Messaggio]
+    max_new_tokens: int = copilota.MAX_NUOVI_TOKEN
+    # Secondi entro cui la risposta deve finire, attesa in coda compresa
+    scadenza_s: float = copilota.SCADENZA_S
+
+@app.get("/healthz")
+def healthz():
+    """Il processo è vivo e risponde."""
+    return {"stato": "ok"}
+
+@app.get("/readyz")
+def readyz(response: Response):
+    """200 quando tutti i motori sono caricati e riscaldati, altrimenti 503; con i tempi di ciascuno."""
+    descrizione = motori.descrizione()
+    if not descrizione["pronto"]:
+        response.status_code = 503
+    return descrizione
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Metriche in formato testo Prometheus."""
+    return PlainTextResponse(metriche.esporta(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/items/{item_id}")
 def read_item(item_id: int):
     return {"item_id": item_id, "name": "Sample Item", "price": 42.0}
@@ -18,6 +130,312 @@ def create_item(item: Item):
     # Logica per salvare o processare l'item
     return item
 
+@app.post("/analyze")
+async def analyze(richiesta: RichiestaAnalisi, request: Request):
+    """
+    Scansione metrica dei versi: per ogni verso sillabe, sinalefe (offset nel verso),
+    tronco, endecasillabo, ictus, uscita e tipo; null per le righe vuote.
+
+    La risposta porta un ETag che dipende solo da versi, backend, formato e versione del
+    motore: se il client lo rimanda in If-None-Match riceve 304 senza rifare l'analisi.
+    Con Accept: application/msgpack la risposta è in MessagePack invece che in JSON.
+    """
+    backend = richiesta.backend or server.BACKEND_SILLABE
+    formato = negozia(request.headers.get("accept"))
+    versi = [normalizza_testo(verso) for verso in richiesta.versi]
+    versione = await asyncio.to_thread(server.versione_motore, backend)
+    chiave = chiave_risposta("analyze", json.dumps(versi, ensure_ascii=False),
+                             {"backend": backend, "formato": formato}, versione)
+    intestazioni = {"ETag": etag(chiave), "Cache-Control": "no-cache", "Vary": "Accept"}
+    if corrisponde(request.headers.get("if-none-match"), chiave):
+        return Response(status_code=304, headers=intestazioni)
+
+    corpo = await asyncio.to_thread(cache_risposte.get, chiave)
+    if corpo is None:
+        risultati = await batcher[backend].analizza(versi)
+        corpo = codifica({"backend": backend, "risultati": risultati}, formato)
+        await asyncio.to_thread(cache_risposte.put, chiave, corpo)
+    return Response(corpo, media_type=FORMATI[formato], headers=intestazioni)
+
+async def posizioni_in_coda(prenotazione):
+    """
+    Attende il turno della prenotazione producendo la posizione in coda ogni mezzo
+    secondo. Se l'attesa si interrompe (scadenza, client che se ne va) libera il posto.
+    """
+    try:
+        while posizione := prenotazione.posizione:
+            yield posizione
+            await asyncio.to_thread(prenotazione.attendi, 0.5)
+    except BaseException:
+        prenotazione.rilascia()
+        raise
+
+async def avvia_generazione(richiesta: RichiestaCopilota, prenotazione):
+    """Avvia la generazione di una prenotazione ammessa, che da qui in poi la rilascia alla fine."""
+    conversazione = [m.model_dump() for m in richiesta.messaggi]
+    try:
+        # Il costruttore può dover caricare il modello: fuori dall'event loop
+        return await asyncio.to_thread(copilota.Generazione, conversazione, richiesta.max_new_tokens, prenotazione)
+    except BaseException:
+        prenotazione.rilascia()
+        raise
+
+async def pezzi_generati(generazione):
+    """
+    Generatore asincrono dei pezzi di testo della risposta. Il modello gira nel suo
+    thread; qui si attende il pezzo successivo senza bloccare l'event loop. Se chi
+    consuma smette prima della fine la generazione viene fermata.
+    """
+    fine = object()
+    completata = False
+    try:
+        while True:
+            testo = await asyncio.to_thread(next, generazione, fine)
+            if testo is fine:
+                completata = True
+                return
+            if testo:
+                yield testo
+    finally:
+        if not completata:
+            generazione.interrompi()
+
+@app.post("/copilot/stream")
+async def copilot_stream(richiesta: RichiestaCopilota, request: Request):
+    """
+    Risposta del copilota come Server-Sent Events: eventi "coda" con la posizione finché
+    la richiesta aspetta il suo turno, un evento per pezzo di testo, poi "fine".
+    A coda piena risponde subito 429; se la scadenza passa in coda l'ultimo evento è "errore".
+    """
+    try:
+        prenotazione = copilota.SCHEDULER.prenota(richiesta.scadenza_s)
+    except coda_generazioni.CodaPiena:
+        raise HTTPException(status_code=429, detail="Troppe richieste al copilota, riprova più tardi")
+
+    async def eventi():
+        generazione = None
+        try:
+            async for posizione in posizioni_in_coda(prenotazione):
+                yield f"event: coda\ndata: {json.dumps({'posizione': posizione})}\n\n"
+            generazione = await avvia_generazione(richiesta, prenotazione)
+            async for testo in pezzi_generati(generazione):
+                if await request.is_disconnected():
+                    generazione.interrompi()
+                    return
+                yield f"data: {json.dumps({'testo': testo}, ensure_ascii=False)}\n\n"
+            yield f"event: fine\ndata: {json.dumps(generazione.statistiche())}\n\n"
+        except coda_generazioni.ScadenzaSuperata as e:
+            yield f"event: errore\ndata: {json.dumps({'errore': str(e)}, ensure_ascii=False)}\n\n"
+        except asyncio.CancelledError:
+            # Starlette cancella il generatore quando il client chiude la connessione
+            if generazione is not None:
+                generazione.interrompi()
+            raise
+        finally:
+            if generazione is None:
+                prenotazione.rilascia()
+
+    return StreamingResponse(eventi(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/copilot/ws")
+async def copilot_ws(websocket: WebSocket):
+    """
+    Ogni messaggio JSON del client ({"messaggi": [...], "max_new_tokens": ...}) avvia una
+    risposta, inviata come {"coda": posizione} finché aspetta il suo turno, {"testo": ...}
+    per pezzo e {"fine": true, ...} alla fine. {"stop": true} o la chiusura della
+    connessione interrompono la generazione in corso o l'attesa in coda.
+    """
+    await websocket.accept()
+    richieste = asyncio.Queue()
+    stato = {"generazione": None, "prenotazione": None}
+
+    async def ricevi():
+        # Resta in ascolto anche durante la generazione per accorgersi di stop e disconnessioni
+        try:
+            while True:
+                messaggio = await websocket.receive_json()
+                if messaggio.get("stop"):
+                    if stato["generazione"] is not None:
+                        stato["generazione"].interrompi()
+                    elif stato["prenotazione"] is not None:
+                        stato["prenotazione"].rilascia()
+                else:
+                    await richieste.put(messaggio)
+        finally:
+            if stato["generazione"] is not None:
+                stato["generazione"].interrompi()
+            elif stato["prenotazione"] is not None:
+                stato["prenotazione"].rilascia()
+            richieste.put_nowait(None)
+
+    ricezione = asyncio.create_task(ricevi())
+    try:
+        while (messaggio := await richieste.get()) is not None:
+            try:
+                richiesta = RichiestaCopilota(**messaggio)
+            except ValidationError as e:
+                await websocket.send_json({"errore": e.errors(include_url=False)})
+                continue
+            try:
+                prenotazione = stato["prenotazione"] = copilota.SCHEDULER.prenota(richiesta.scadenza_s)
+            except coda_generazioni.CodaPiena as e:
+                await websocket.send_json({"errore": str(e)})
+                continue
+            try:
+                async for posizione in posizioni_in_coda(prenotazione):
+                    await websocket.send_json({"coda": posizione})
+            except coda_generazioni.ScadenzaSuperata as e:
+                await websocket.send_json({"errore": str(e)})
+                continue
+            finally:
+                stato["prenotazione"] = None
+            if not prenotazione.ammessa:
+                # Fermata con {"stop": true} mentre era in coda
+                await websocket.send_json({"fine": True, "interrotta": True})
+                continue
+            generazione = stato["generazione"] = await avvia_generazione(richiesta, prenotazione)
+            async for testo in pezzi_generati(generazione):
+                await websocket.send_json({"testo": testo})
+            stato["generazione"] = None
+            await websocket.send_json({"fine": True, **generazione.statistiche()})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if stato["generazione"] is not None:
+            stato["generazione"].interrompi()
+        ricezione.cancel()
+
+@app.websocket("/scansione/ws")
+async def scansione_ws(websocket: WebSocket, backend: Literal["spacy", "regole"] | None = None):
+    """
+    Scansione dal vivo per l'editor. Il client invia le modifiche per righe man mano che
+    il poeta scrive, {"versione": n, "modifiche": [{"inizio": i, "fine": j, "righe": [...]}]},
+    oppure {"versione": n, "testo": ...} per ripartire dal testo completo; il server
+    risponde {"versione": n, "righe": totale, "risultati": [{"riga": posizione, ...}]}
+    solo per le righe toccate, con i campi di /analyze (solo "riga" per le righe vuote).
+    Le modifiche che arrivano a pochi millisecondi l'una dall'altra, o mentre la
+    precedente è in analisi, vengono accorpate in una sola risposta.
+    """
+    await websocket.accept()
+    backend = backend or server.BACKEND_SILLABE
+    analizzatore = await asyncio.to_thread(server.AnalizzatoreIncrementale, backend)
+    loop = asyncio.get_running_loop()
+    messaggi = asyncio.Queue()
+
+    def analizza(versi):
+        # Le righe nuove passano dal micro-batcher, insieme a quelle delle altre connessioni
+        return asyncio.run_coroutine_threadsafe(batcher[backend].analizza(versi), loop).result()
+
+    async def ricevi():
+        try:
+            while True:
+                await messaggi.put(await websocket.receive_json())
+        finally:
+            messaggi.put_nowait(None)
+
+    async def accorpa():
+        """Attende un messaggio e raccoglie quelli che lo seguono a breve; None a connessione chiusa."""
+        raccolti = [await messaggi.get()]
+        scadenza = loop.time() + ATTESA_SCANSIONE_MAX
+        while raccolti[-1] is not None:
+            try:
+                raccolti.append(messaggi.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            attesa = min(ATTESA_SCANSIONE, scadenza - loop.time())
+            if attesa <= 0:
+                break
+            try:
+                raccolti.append(await asyncio.wait_for(messaggi.get(), attesa))
+            except asyncio.TimeoutError:
+                break
+        return None if raccolti[-1] is None else raccolti
+
+    ricezione = asyncio.create_task(ricevi())
+    try:
+        while (raccolti := await accorpa()) is not None:
+            versione = raccolti[-1].get("versione") if isinstance(raccolti[-1], dict) else None
+            try:
+                modifiche = []
+                for messaggio in raccolti:
+                    if not isinstance(messaggio, dict):
+                        raise ValueError("Il messaggio deve essere un oggetto JSON")
+                    if "testo" in messaggio:
+                        if not isinstance(messaggio["testo"], str):
+                            raise ValueError("Il testo deve essere una stringa")
+                        modifiche = [(0, None, messaggio["testo"].split("\n"))]
+                    else:
+                        modifiche.extend((m["inizio"], m["fine"], m["righe"]) for m in messaggio["modifiche"])
+                # applica_modifiche lavora su una copia: con una modifica non valida il testo resta com'era
+                righe, risultati = await asyncio.to_thread(analizzatore.applica_modifiche, modifiche, analizza)
+            except (ValueError, KeyError, TypeError) as e:
+                # Client e server non hanno più lo stesso testo: il client deve rimandarlo intero
+                await websocket.send_json({"versione": versione, "errore": str(e), "righe": len(analizzatore.righe)})
+                continue
+            await websocket.send_json({
+                "versione": versione,
+                "righe": righe,
+                "risultati": [{"riga": posizione, **(risultato or {})} for posizione, risultato in risultati.items()],
+            })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        ricezione.cancel()
+
+@app.post("/jobs", status_code=202)
+async def crea_lavoro(request: Request, salto: int = Query(50, gt=0)):
+    """
+    Avvia un'analisi ELS del PDF inviato come corpo della richiesta (application/pdf)
+    e restituisce subito l'id del lavoro da interrogare su /jobs/{id}.
+    """
+    pdf = await request.body()
+    if not pdf.startswith(b"%PDF-"):
+        raise HTTPException(status_code=400, detail="Il corpo della richiesta deve essere un file PDF")
+    try:
+        id_lavoro = await asyncio.to_thread(lavori.invia, pdf, salto)
+    except CodaPiena:
+        raise HTTPException(status_code=429, detail="Troppi lavori in corso, riprova più tardi")
+    return lavori.stato(id_lavoro)
+
+@app.get("/jobs/{id_lavoro}")
+def stato_lavoro(id_lavoro: str):
+    """Stato del lavoro, con le pagine lette e le parole cercate per i salti."""
+    stato = lavori.stato(id_lavoro)
+    if stato is None:
+        raise HTTPException(status_code=404, detail="Lavoro non trovato")
+    return stato
+
+@app.get("/jobs/{id_lavoro}/result")
+def risultato_lavoro(id_lavoro: str, request: Request, formato: Literal["json", "msgpack", "html"] | None = None,
+                     indici: Literal["liste", "compatti"] = "liste"):
+    """
+    Risultati del lavoro, inviati a pezzi dal file su disco. Senza formato si sceglie
+    dall'header Accept (JSON o MessagePack); con indici=compatti le liste di indici
+    (indici_saltatoria, indici_semantici, dettagli_semantici) sono array impacchettati.
+    """
+    if lavori.stato(id_lavoro) is None:
+        raise HTTPException(status_code=404, detail="Lavoro non trovato")
+    formato = negozia(request.headers.get("accept"), formato)
+    percorso = lavori.risultato(id_lavoro, formato, indici)
+    if percorso is None:
+        raise HTTPException(status_code=409, detail="Il lavoro non è completato")
+    return FileResponse(percorso, media_type="text/html" if formato == "html" else FORMATI[formato],
+                        headers={"Vary": "Accept"})
+
+@app.post("/jobs/{id_lavoro}/cancel", status_code=202)
+def annulla_lavoro(id_lavoro: str):
+    if not lavori.annulla(id_lavoro):
+        raise HTTPException(status_code=404, detail="Lavoro non trovato")
+    return lavori.stato(id_lavoro)
+
+@app.delete("/jobs/{id_lavoro}", status_code=204)
+def elimina_lavoro(id_lavoro: str):
+    """Annulla il lavoro se non è terminato e ne cancella i risultati."""
+    if not lavori.elimina(id_lavoro):
+        raise HTTPException(status_code=404, detail="Lavoro non trovato")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
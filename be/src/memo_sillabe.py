@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Memo LRU parola -> sillabe, con persistenza opzionale su SQLite.
+
+Il memo sta sopra al lessico delle eccezioni: ogni voce è legata alla
+versione del lessico con cui è stata calcolata, così una modifica alla
+tabella `eccezioni` invalida tutto ciò che era stato memorizzato prima.
+Le voci nuove si scrivono con salva(), e da sole quando superano `soglia`,
+così una scansione lunga non le accumula in memoria.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Voci nuove oltre le quali put() le scrive sul database
+SOGLIA_NUOVE = 5000
+
+
+def impronta_eccezioni(eccezioni):
+    """Restituisce un'impronta stabile del contenuto del lessico delle eccezioni."""
+    sha = hashlib.sha1()
+    for parola, sillabe in sorted(eccezioni.items()):
+        sha.update(f"{parola}\t{sillabe}\n".encode("utf-8"))
+    return sha.hexdigest()
+
+
+class MemoSillabe:
+    def __init__(self, capacita=50000, db_path=None, versione="", soglia=SOGLIA_NUOVE):
+        self.capacita = capacita
+        self.soglia = soglia
+        self.db_path = db_path
+        self.versione = versione
+        self.voci = OrderedDict()
+        self.nuove = {}
+        self.hits = 0
+        self.misses = 0
+        # aggiorna_lessico può invalidare il memo da un thread mentre un altro lo sta leggendo
+        self.lock = threading.Lock()
+        if self.db_path:
+            self.init_tabella()
+
+    def init_tabella(self):
+        conn = sqlite3.connect(self.db_path)
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS cache_sillabe (
+                parola TEXT,
+                backend TEXT,
+                sillabe INTEGER,
+                versione TEXT,
+                PRIMARY KEY (parola, backend)
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def get(self, chiave):
+        with self.lock:
+            sillabe = self.voci.get(chiave)
+            if sillabe is None:
+                self.misses += 1
+                return None
+            self.voci.move_to_end(chiave)
+            self.hits += 1
+            return sillabe
+
+    def put(self, chiave, sillabe):
+        with self.lock:
+            self.voci[chiave] = sillabe
+            self.voci.move_to_end(chiave)
+            if self.db_path:
+                self.nuove[chiave] = sillabe
+            if len(self.voci) > self.capacita:
+                self.voci.popitem(last=False)
+            da_salvare = len(self.nuove) >= self.soglia
+        if da_salvare:
+            self.salva()
+
+    def invalida(self, versione):
+        """Svuota il memo se la versione del lessico è cambiata."""
+        with self.lock:
+            if versione == self.versione:
+                return False
+            self.versione = versione
+            self.voci.clear()
+            self.nuove.clear()
+        if self.db_path:
+            conn = sqlite3.connect(self.db_path)
+            cur = conn.cursor()
+            cur.execute("DELETE FROM cache_sillabe WHERE versione != ?", (versione,))
+            conn.commit()
+            conn.close()
+        return True
+
+    def carica(self):
+        """Carica dal database le voci calcolate con la versione corrente del lessico."""
+        if not self.db_path:
+            return 0
+        conn = sqlite3.connect(self.db_path)
+        cur = conn.cursor()
+        cur.execute("SELECT parola, backend, sillabe FROM cache_sillabe WHERE versione = ? LIMIT ?",
+                    (self.versione, self.capacita))
+        rows = cur.fetchall()
+        conn.close()
+        with self.lock:
+            for parola, backend, sillabe in rows:
+                self.voci[(parola, backend)] = sillabe
+        return len(rows)
+
+    def salva(self):
+        """Scrive sul database le voci nuove dall'ultimo salvataggio."""
+        if not self.db_path or not self.nuove:
+            return 0
+        with self.lock:
+            righe = [(parola, backend, sillabe, self.versione) for (parola, backend), sillabe in self.nuove.items()]
+            self.nuove.clear()
+        conn = sqlite3.connect(self.db_path)
+        cur = conn.cursor()
+        cur.executemany(
+            "INSERT OR REPLACE INTO cache_sillabe (parola, backend, sillabe, versione) VALUES (?, ?, ?, ?)",
+            righe,
+        )
+        conn.commit()
+        conn.close()
+        return len(righe)
+
+    def get_current_stats(self):
+        totale = self.hits + self.misses
+        return {
+            'voci': len(self.voci),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / totale if totale else 0.0
+        }
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Metriche di latenza per stadio in formato testo Prometheus.
+
+Gli istogrammi hanno limiti fissi e un'osservazione costa una ricerca
+binaria e due somme, senza lock: sotto il GIL un aggiornamento perso per
+una race tra thread è possibile ma raro e irrilevante per una metrica.
+Gli stadi della scansione si osservano una volta per blocco di versi (un
+blocco del micro-batch o di scansiona_flusso), non per verso, così la
+misura resta trascurabile rispetto al lavoro misurato. Code, cache e hit
+ratio non si misurano a ogni evento: si leggono dai loro get_current_stats()
+solo quando viene chiesto /metrics.
+"""
+
+import time
+from bisect import bisect_left
+
+PREFISSO = "poem4astarte_"
+
+# Da 50 µs a 60 s: copre un verso singolo come un intero documento ELS
+LIMITI_SECONDI = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                  0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LIMITI_TOKEN_AL_SECONDO = (0.5, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Istogramma:
+    __slots__ = ("limiti", "conteggi", "somma", "totale")
+
+    def __init__(self, limiti=LIMITI_SECONDI):
+        self.limiti = limiti
+        self.conteggi = [0] * (len(limiti) + 1)
+        self.somma = 0.0
+        self.totale = 0
+
+    def osserva(self, valore):
+        self.conteggi[bisect_left(self.limiti, valore)] += 1
+        self.somma += valore
+        self.totale += 1
+
+    def righe(self, nome, etichette=""):
+        separatore = "," if etichette else ""
+        cumulato = 0
+        for limite, conteggio in zip(self.limiti, self.conteggi):
+            cumulato += conteggio
+            yield f'{nome}_bucket{{{etichette}{separatore}le="{limite}"}} {cumulato}'
+        yield f'{nome}_bucket{{{etichette}{separatore}le="+Inf"}} {self.totale}'
+        suffisso = f"{{{etichette}}}" if etichette else ""
+        yield f"{nome}_sum{suffisso} {self.somma}"
+        yield f"{nome}_count{suffisso} {self.totale}"
+
+
+# Durata di ogni esecuzione di uno stadio: un blocco di versi per parse, sinalefe e
+# conteggio delle sillabe, un documento per ELS e HTML
+STADI = {}
+PRIMO_TOKEN = Istogramma()
+TOKEN_AL_SECONDO = Istogramma(LIMITI_TOKEN_AL_SECONDO)
+
+# nome -> (tipo, descrizione, funzione che restituisce {etichette: valore})
+_misure = {}
+
+
+def stadio(nome):
+    """Restituisce l'istogramma dello stadio, creandolo al primo uso."""
+    istogramma = STADI.get(nome)
+    if istogramma is None:
+        istogramma = STADI.setdefault(nome, Istogramma())
+    return istogramma
+
+
+def osserva_stadio(nome, inizio):
+    """Registra la durata di uno stadio iniziato a inizio (time.perf_counter())."""
+    stadio(nome).osserva(time.perf_counter() - inizio)
+
+
+def registra_misura(nome, descrizione, funzione, tipo="gauge"):
+    """
+    Registra una misura letta al momento dell'esportazione.
+
+    Args:
+        nome: Nome della metrica, senza prefisso
+        descrizione: Testo per la riga HELP
+        funzione: Restituisce un numero o un dizionario {"chiave=\\"valore\\"": numero}
+        tipo: "gauge" o "counter"
+    """
+    _misure[nome] = (tipo, descrizione, funzione)
+
+
+def esporta():
+    """Restituisce tutte le metriche in formato testo Prometheus 0.0.4."""
+    righe = []
+
+    nome = PREFISSO + "stadio_durata_secondi"
+    righe.append(f"# HELP {nome} Durata di ogni esecuzione di uno stadio della pipeline")
+    righe.append(f"# TYPE {nome} histogram")
+    for nome_stadio, istogramma in sorted(STADI.items()):
+        righe.extend(istogramma.righe(nome, f'stadio="{nome_stadio}"'))
+
+    for nome, descrizione, istogramma in (
+        ("copilota_primo_token_secondi", "Tempo dall'avvio della generazione al primo token", PRIMO_TOKEN),
+        ("copilota_token_al_secondo", "Velocità di generazione dopo il primo token", TOKEN_AL_SECONDO),
+    ):
+        nome = PREFISSO + nome
+        righe.append(f"# HELP {nome} {descrizione}")
+        righe.append(f"# TYPE {nome} histogram")
+        righe.extend(istogramma.righe(nome))
+
+    for nome, (tipo, descrizione, funzione) in sorted(_misure.items()):
+        try:
+            valori = funzione()
+        except Exception:
+            # Una sorgente non disponibile (es. motore non ancora caricato) non blocca le altre
+            continue
+        nome = PREFISSO + nome
+        righe.append(f"# HELP {nome} {descrizione}")
+        righe.append(f"# TYPE {nome} {tipo}")
+        if isinstance(valori, dict):
+            for etichette, valore in sorted(valori.items()):
+                righe.append(f"{nome}{{{etichette}}} {float(valore)}")
+        else:
+            righe.append(f"{nome} {float(valori)}")
+    return "\n".join(righe) + "\n"
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Micro-batcher per le richieste di scansione dell'API.
+
+Le richieste concorrenti non chiamano spaCy una per una: i loro versi
+vengono raccolti per pochi millisecondi (o finché il blocco non è pieno) e
+analizzati con un'unica chiamata, in un thread dedicato così l'event loop
+resta libero. Mentre un blocco è in analisi le richieste nuove si accumulano
+e partono tutte insieme nel blocco successivo.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+ATTESA_MAX = 0.005
+VERSI_MAX = 512
+
+
+class MicroBatcher:
+    def __init__(self, funzione, attesa_max=ATTESA_MAX, versi_max=VERSI_MAX):
+        """
+        Args:
+            funzione: Funzione bloccante lista di versi -> lista di risultati allineata
+            attesa_max: Secondi di attesa massima per riempire un blocco
+            versi_max: Numero di versi oltre il quale il blocco parte subito
+        """
+        self.funzione = funzione
+        self.attesa_max = attesa_max
+        self.versi_max = versi_max
+        self.esecutore = None
+        self.coda = None
+        self.ciclo = None
+        self.blocchi = 0
+        self.versi = 0
+
+    def _avvia(self):
+        if self.esecutore is None:
+            # Un solo thread: pipeline spaCy e memo non vanno usati da più thread insieme
+            self.esecutore = ThreadPoolExecutor(max_workers=1, thread_name_prefix="micro-batch")
+        loop = asyncio.get_running_loop()
+        if self.ciclo is None or self.ciclo.done() or self.ciclo.get_loop() is not loop:
+            self.coda = asyncio.Queue()
+            self.ciclo = loop.create_task(self._ciclo())
+
+    async def analizza(self, versi):
+        """Accoda i versi di una richiesta e attende i loro risultati."""
+        if not versi:
+            return []
+        self._avvia()
+        futuro = asyncio.get_running_loop().create_future()
+        await self.coda.put((list(versi), futuro))
+        return await futuro
+
+    async def _raccogli(self):
+        richieste = [await self.coda.get()]
+        totale = len(richieste[0][0])
+        loop = asyncio.get_running_loop()
+        scadenza = loop.time() + self.attesa_max
+        while totale < self.versi_max:
+            attesa = scadenza - loop.time()
+            try:
+                if attesa > 0:
+                    richiesta = await asyncio.wait_for(self.coda.get(), attesa)
+                else:
+                    richiesta = self.coda.get_nowait()
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+            richieste.append(richiesta)
+            totale += len(richiesta[0])
+        return richieste
+
+    async def _ciclo(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            richieste = await self._raccogli()
+            versi = [verso for versi_richiesta, _ in richieste for verso in versi_richiesta]
+            try:
+                risultati = await loop.run_in_executor(self.esecutore, self.funzione, versi)
+            except Exception as e:
+                for _, futuro in richieste:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+            self.blocchi += 1
+            self.versi += len(versi)
+            inizio = 0
+            for versi_richiesta, futuro in richieste:
+                fine = inizio + len(versi_richiesta)
+                if not futuro.done():
+                    futuro.set_result(risultati[inizio:fine])
+                inizio = fine
+
+    def get_current_stats(self):
+        return {
+            "blocchi": self.blocchi,
+            "versi": self.versi,
+            "versi_per_blocco": self.versi / self.blocchi if self.blocchi else 0.0,
+            "in_coda": self.coda.qsize() if self.coda else 0,
+        }
+
+    async def chiudi(self):
+        if self.ciclo is not None:
+            self.ciclo.cancel()
+            try:
+                await self.ciclo
+            except asyncio.CancelledError:
+                pass
+            self.ciclo = None
+        if self.esecutore is not None:
+            self.esecutore.shutdown(wait=False)
+            self.esecutore = None
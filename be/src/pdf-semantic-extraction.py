@@ -9,37 +9,40 @@ from typing import List, Dict, Tuple
 import html
 import PyPDF2
 from io import StringIO
-import nltk
-from nltk.corpus import words
 
-# Scarica il dataset di parole se non è già presente
-nltk.download("words")
+_parole_italiane = None
 
-# Filtra solo le parole italiane con più di 3 lettere
-parole_italiane = [word for word in words.words() if len(word) > 3 and word.isalpha()]
 
-# Stampa le prime 10 parole per verifica
-print(parole_italiane[:10])
+def get_parole_italiane() -> List[str]:
+    """
+    Carica al primo utilizzo il dizionario italiano (parole con più di 3 lettere),
+    così il modulo si può importare, ad esempio dai worker dei lavori in background,
+    senza scaricare nulla.
+    """
+    global _parole_italiane
+    if _parole_italiane is None:
+        from spellchecker import SpellChecker
+
+        # Inizializza lo spell checker in italiano
+        spell = SpellChecker(language="it")
 
-from spellchecker import SpellChecker
+        # Ottieni la lista delle parole, tutte in minuscolo
+        _parole_italiane = [word.lower() for word in spell.word_frequency.keys() if len(word) > 3]
+    return _parole_italiane
 
-# Inizializza lo spell checker in italiano
-spell = SpellChecker(language="it")
 
-# Ottieni la lista delle parole
-parole_italiane = [word for word in spell.word_frequency.keys() if len(word) > 3]
-#parole italiano tutte to lowercase
-parole_italiane = [word.lower() for word in parole_italiane]
-# Stampa un'anteprima delle parole
-print(parole_italiane[:10])
+def _segnala(progresso, fase: str, fatti: int, totale: int) -> None:
+    if progresso is not None:
+        progresso(fase, fatti, totale)
 
 
-def leggi_pdf(percorso_file: str) -> Dict[str, str]:
+def leggi_pdf(percorso_file: str, progresso=None) -> Dict[str, str]:
     """
     Legge un file PDF e restituisce un dizionario con titoli e testo dei paragrafi.
     
     Args:
         percorso_file: Percorso del file PDF da leggere
+        progresso: Funzione opzionale (fase, fatti, totale) chiamata dopo ogni pagina
         
     Returns:
         Un dizionario dove le chiavi sono i titoli dei paragrafi e i valori sono i contenuti
@@ -74,6 +77,8 @@ def leggi_pdf(percorso_file: str) -> Dict[str, str]:
                         titolo_corrente = linea.rstrip(':.')
                     else:
                         testo_corrente.append(linea)
+
+                _segnala(progresso, "pagine", page_num + 1, len(pdf_reader.pages))
             
             # Aggiungi l'ultimo paragrafo
             if testo_corrente:
@@ -124,7 +129,7 @@ def estrazione_saltatoria(testo: str, salto: int = 50) -> Tuple[List[str], List[
     parole_trovate = []
     indici_parole = []
     
-    for parola in parole_italiane:
+    for parola in get_parole_italiane():
         parola = re.sub(r'\s+', '', parola).lower()
         # Rimuovi punteggiatura e caratteri non alfanumerici
         parola = re.sub(r'[^\w\s]', '', parola)
@@ -141,18 +146,20 @@ def estrazione_saltatoria(testo: str, salto: int = 50) -> Tuple[List[str], List[
             indici_parole.append(indici_originali)
     
     return parole_trovate, indici_parole
-def incroci_semantici(testo: str, salto: int) -> Tuple[List[str], Dict[str, List[Tuple[int, int, List[int]]]]]:
+
+def incroci_semantici(testo: str, salto: int, progresso=None) -> Tuple[List[str], Dict[str, List[Tuple[int, int, List[int]]]]]:
     """
     Identifica incroci semantici nel testo (tipo Michael Drosnin).
     
     Args:
         testo: Il testo da analizzare
+        progresso: Funzione opzionale (fase, fatti, totale) chiamata ogni 100 parole cercate
         
     Returns:
         Tupla con lista di risultati e dizionario con dettagli delle occorrenze
     """
     # Lista di parole significative da cercare (esempio)
-    parole_chiave = parole_italiane
+    parole_chiave = get_parole_italiane()
     
     # Rimuovi spazi e normalizza il testo
     testo_pulito = re.sub(r'\s+', '', testo).lower()
@@ -162,7 +169,9 @@ def incroci_semantici(testo: str, salto: int) -> Tuple[List[str], Dict[str, List
     dettagli_occorrenze = {}
     
     # Cerca sequenze ELS per ogni parola chiave
-    for parola in parole_chiave:
+    for numero, parola in enumerate(parole_chiave):
+        if numero % 100 == 0:
+            _segnala(progresso, "salti", numero, len(parole_chiave))
         for salto2 in range(salto, salto + 3):  # Prova diversi salti
             for posizione_iniziale in range(salto2):
                 sequenza = ""
@@ -190,6 +199,8 @@ def incroci_semantici(testo: str, salto: int) -> Tuple[List[str], Dict[str, List
                     dettagli_occorrenze[parola].append((salto2, posizione_iniziale, indici_parola))
                     break  # Passa alla prossima parola chiave dopo il primo match
     
+    _segnala(progresso, "salti", len(parole_chiave), len(parole_chiave))
+
     # Ordina i risultati per posizione nel testo
     risultati.sort(key=lambda x: x[1])
     # Estrai solo i risultati ordinati senza gli indici
@@ -514,41 +525,20 @@ def crea_output_html(paragrafi: Dict[str, str], risultati_estesi: Dict[str, Dict
     
     return html_output
 
-def main():
-    """Funzione principale del programma"""
-    if len(sys.argv) != 3:
-        print("Utilizzo: python estrazione_semantica_pdf.py <percorso_file.pdf> num_salto")
-        sys.exit(1)
-    
-    percorso_file = sys.argv[1]
-    salto = sys.argv[2]
-    #parse int 
-    try:
-        salto = int(salto)
-    except ValueError:
-        print("Errore: Il numero di salto deve essere un numero intero.")
-        sys.exit(1)
-    
-    if salto <= 0:
-        print("Errore: Il numero di salto deve essere maggiore di 0.")
-        sys.exit(1)
+def analizza_documento(percorso_file: str, salto: int, progresso=None) -> Tuple[Dict[str, str], Dict[str, Dict[str, any]], Dict[str, Dict[str, any]]]:
+    """
+    Esegue estrazione saltatoria e incroci semantici sull'intero documento.
     
-    # Verifica se il file PDF esiste e se è in formato corretto
-    # Utilizza PyMuPDF per leggere il file PDF e verificare il formato
-
-    if not os.path.exists(percorso_file):
-        print(f"Errore: Il file '{percorso_file}' non esiste.")
-        sys.exit(1)
+    Args:
+        percorso_file: Percorso del file PDF da analizzare
+        salto: Il passo dell'estrazione
+        progresso: Funzione opzionale (fase, fatti, totale) per seguire pagine lette e salti cercati
         
-    if not percorso_file.endswith('.pdf'):
-        print("Errore: Il file deve essere in formato PDF.")
-        sys.exit(1)
-    
-    print(f"Analisi del file: {percorso_file}")
-    print("Elaborazione in corso...\n")
-    
+    Returns:
+        Tupla con paragrafi, risultati semplici (per output TXT) e risultati estesi (per output HTML)
+    """
     # Leggi il documento PDF
-    paragrafi = leggi_pdf(percorso_file)
+    paragrafi = leggi_pdf(percorso_file, progresso)
     
     # Dizionario per i risultati semplici (per output TXT)
     risultati = {}
@@ -581,7 +571,7 @@ def main():
     parole_saltatoria_ordinate = [parola for parola, _ in parole_con_indici]
         
     # Incroci semantici con dettagli - ora restituisce già risultati ordinati
-    risultati_semantici, dettagli_semantici = incroci_semantici(testo_completo, salto)
+    risultati_semantici, dettagli_semantici = incroci_semantici(testo_completo, salto, progresso)
         
     # Raccogli tutti gli indici per evidenziazione HTML
     tutti_indici_saltatoria = []
@@ -590,7 +580,7 @@ def main():
         
     tutti_indici_semantici = []
     for parola, occorrenze in dettagli_semantici.items():
-        for salto, posizione, indici in occorrenze:
+        for salto2, posizione, indici in occorrenze:
             tutti_indici_semantici.extend(indici)
         
     # Salva risultati semplici per output TXT
@@ -608,7 +598,44 @@ def main():
         "indici_saltatoria": tutti_indici_saltatoria,
         "indici_semantici": tutti_indici_semantici,
         "dettagli_semantici": dettagli_semantici
-    }    
+    }
+    
+    return paragrafi, risultati, risultati_estesi
+
+def main():
+    """Funzione principale del programma"""
+    if len(sys.argv) != 3:
+        print("Utilizzo: python estrazione_semantica_pdf.py <percorso_file.pdf> num_salto")
+        sys.exit(1)
+    
+    percorso_file = sys.argv[1]
+    salto = sys.argv[2]
+    #parse int 
+    try:
+        salto = int(salto)
+    except ValueError:
+        print("Errore: Il numero di salto deve essere un numero intero.")
+        sys.exit(1)
+    
+    if salto <= 0:
+        print("Errore: Il numero di salto deve essere maggiore di 0.")
+        sys.exit(1)
+    
+    # Verifica se il file PDF esiste e se è in formato corretto
+    # Utilizza PyMuPDF per leggere il file PDF e verificare il formato
+
+    if not os.path.exists(percorso_file):
+        print(f"Errore: Il file '{percorso_file}' non esiste.")
+        sys.exit(1)
+        
+    if not percorso_file.endswith('.pdf'):
+        print("Errore: Il file deve essere in formato PDF.")
+        sys.exit(1)
+    
+    print(f"Analisi del file: {percorso_file}")
+    print("Elaborazione in corso...\n")
+    
+    paragrafi, risultati, risultati_estesi = analizza_documento(percorso_file, salto)
     
     # Mostra i risultati in formato testo
     output_formattato = crea_output_formattato(risultati)
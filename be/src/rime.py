@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Riconoscimento dello schema delle rime.
+
+Di ogni verso si calcola la coda di rima (dalla vocale tonica dell'ultima
+parola in poi) e la si cerca in un indice hash: ogni coda nuova riceve
+l'etichetta successiva (A, B, C, ... Z, AA, AB, ...). L'intera poesia si
+etichetta così in un solo passaggio, senza confrontare i versi a coppie.
+Le uscite in iato con la i/u tonica (mì-o, vì-a, lu-ì) non si distinguono
+dai dittonghi con le sole regole: quando la sillabazione è incerta, o il
+lessico delle eccezioni dà alla parola più sillabe, la coda parte dalla i/u.
+"""
+
+import re
+import unicodedata
+
+from risultati_colonnari import RE_CANTO
+from sillabazione import VOCALI, VOCALI_ACCENTATE, VOCALI_DEBOLI, normalizza_parola, sillaba_parola
+
+RE_PAROLA = re.compile(r"[^\W\d_]+(?:['’`][^\W\d_]*)*")
+
+
+def _senza_diacritici(testo):
+    return "".join(c for c in unicodedata.normalize("NFD", testo) if not unicodedata.combining(c))
+
+
+def etichetta(indice):
+    """0 -> A, 25 -> Z, 26 -> AA, ..."""
+    lettere = ""
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        lettere = chr(ord("A") + resto) + lettere
+    return lettere
+
+
+def _iato_finale(parola, sillabe, eccezioni):
+    """Vero se la parola finisce con una i/u tonica seguita da vocale (mì-o, vì-a, fù-e, lu-ì)."""
+    if len(parola) < 2 or parola[-2] not in VOCALI_DEBOLI or parola[-1] not in VOCALI or parola[-1] in VOCALI_ACCENTATE:
+        return False
+    # "ui" dopo consonante è sempre tonico sulla i (lui, colui, altrui), tranne dopo q e g (qui, seguì)
+    if parola[-2:] == "ui" and len(parola) > 2 and parola[-3] not in VOCALI + "qg":
+        return True
+    _, incerta = sillaba_parola(sillabe[-1])
+    if incerta:
+        return True
+    return eccezioni is not None and (eccezioni.get(parola) or 0) > len(sillabe)
+
+
+def coda_rima(verso, lessico_accenti, eccezioni=None):
+    """
+    Restituisce la coda di rima del verso (es. "ente" per "dolente"), o None
+    se il verso non contiene parole.
+
+    Args:
+        eccezioni: Il lessico delle eccezioni metriche (parola -> sillabe), o None
+    """
+    parole = RE_PAROLA.findall(verso)
+    if not parole:
+        return None
+    ultima = normalizza_parola(parole[-1])
+    # Elisione ("ch'i'", "l'abbaia"): conta la parte dopo l'ultimo apostrofo, ma un apostrofo
+    # tra vocale e consonante sta dentro la parola (fe'lli, me'zzo)
+    pezzi = [pezzo for pezzo in re.split(r"['’]", ultima) if pezzo]
+    if pezzi:
+        ultima = pezzi.pop()
+        while pezzi and pezzi[-1][-1] in VOCALI and ultima[0] not in VOCALI:
+            ultima = pezzi.pop() + ultima
+    sillabe, _ = sillaba_parola(ultima)
+    if not sillabe:
+        return None
+    if _iato_finale(ultima, sillabe, eccezioni):
+        return _senza_diacritici(ultima[-2:])
+    dal_fondo = lessico_accenti.posizione_accento(ultima, len(sillabe))
+    tonica = sillabe[len(sillabe) - 1 - dal_fondo]
+    # Dalla vocale tonica in poi, saltando le semivocali di un dittongo ascendente (fiore, chiaro, figliuolo)
+    inizio = next((i for i, c in enumerate(tonica) if c in VOCALI), len(tonica))
+    vocale = inizio
+    while vocale + 1 < len(tonica) and tonica[vocale] in VOCALI_DEBOLI and tonica[vocale + 1] in VOCALI:
+        vocale += 1
+    if vocale > inizio:
+        inizio = vocale
+    elif dal_fondo and inizio + 1 < len(tonica) and tonica[inizio + 1] in VOCALI_DEBOLI:
+        # Gruppo vocale + i/u in parola piana: quasi sempre iato tonico (pa-ù-ra rima con dura)
+        inizio += 1
+    coda = tonica[inizio:] + "".join(sillabe[len(sillabe) - dal_fondo:])
+    return _senza_diacritici(coda)
+
+
+def schema_rime(righe, lessico_accenti, eccezioni=None):
+    """
+    Etichetta le rime di una poesia in tempo lineare.
+
+    Le righe vuote separano le strofe; una riga "CANTO ..." chiude la strofa
+    e fa ripartire le etichette da A.
+
+    Args:
+        righe: Iterabile di tuple (numero_riga, verso), come da flusso_versi.apri_sorgente
+        lessico_accenti: Il LessicoAccenti per trovare la sillaba tonica
+        eccezioni: Il lessico delle eccezioni metriche, per riconoscere gli iati finali
+
+    Returns:
+        Tupla con la lista di (numero_riga, etichetta) per ogni verso e la lista
+        delle strofe come dizionari {"inizio", "fine", "etichette", "schema"}
+    """
+    etichette_versi = []
+    strofe = []
+    indice = {}
+    strofa = []
+
+    def chiudi_strofa():
+        if strofa:
+            strofe.append({
+                "inizio": strofa[0][0],
+                "fine": strofa[-1][0],
+                "etichette": [e for _, e in strofa],
+                "schema": "".join(e if len(e) == 1 else f"({e})" for _, e in strofa)
+            })
+            strofa.clear()
+
+    for numero, verso in righe:
+        if not verso.strip():
+            chiudi_strofa()
+            continue
+        if RE_CANTO.match(verso):
+            chiudi_strofa()
+            indice.clear()
+            continue
+        coda = coda_rima(verso, lessico_accenti, eccezioni)
+        if coda is None:
+            continue
+        if coda not in indice:
+            indice[coda] = etichetta(len(indice))
+        strofa.append((numero, indice[coda]))
+        etichette_versi.append((numero, indice[coda]))
+    chiudi_strofa()
+    return etichette_versi, strofe
+
+
+def _concatenate(precedente, successiva):
+    """Vero se la strofa successiva continua la catena ABA BCB della precedente."""
+    p = precedente["etichette"]
+    s = successiva["etichette"]
+    if len(p) != 3 or p[0] != p[2]:
+        return False
+    if len(s) == 3:
+        return s[0] == p[1] and s[2] == p[1]
+    # Verso isolato di chiusura
+    return len(s) == 1 and s[0] == p[1]
+
+
+def accuratezza_terza_rima(strofe):
+    """
+    Misura quanto un canto rispetta la terza rima.
+
+    Returns:
+        Tupla (passaggi tra strofe consecutive che continuano la catena, passaggi totali)
+    """
+    passaggi = list(zip(strofe, strofe[1:]))
+    return sum(_concatenate(p, s) for p, s in passaggi), len(passaggi)
+
+
+def e_terza_rima(strofe):
+    """Verifica lo schema ABA BCB CDC ... di un canto, con l'eventuale verso isolato di chiusura."""
+    corretti, totale = accuratezza_terza_rima(strofe)
+    return totale > 0 and corretti == totale
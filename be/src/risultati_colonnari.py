@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Contenitore colonnare per i risultati della scansione metrica di un corpus.
+
+Ogni campo dei record prodotti da scansiona_flusso() è salvato in un array
+tipizzato invece che in un dizionario per verso: la Commedia intera occupa
+poche decine di KB e il file binario si può riaprire con mmap senza copiarlo.
+Le statistiche si calcolano con NumPy direttamente sui buffer delle colonne.
+"""
+
+import mmap
+import re
+import struct
+import sys
+from array import array
+
+import numpy as np
+
+MAGIC = b"P4AC"
+VERSIONE_FORMATO = 1
+# magic, versione formato, numero di versi, padding fino a 16 byte
+HEADER = struct.Struct("<4sHI6x")
+
+# Colonne in ordine di dimensione decrescente, così restano allineate nel file
+COLONNE = (
+    ("riga", "I"),
+    ("canto", "H"),
+    ("sillabe", "b"),
+    ("sinalefe", "B"),
+    ("flag", "B"),
+)
+FLAG_TRONCO = 1
+FLAG_ENDECASILLABO = 2
+
+RE_CANTO = re.compile(r"^\s*CANTO\b", re.IGNORECASE)
+
+
+def _blocchi_colonne(dati, n):
+    """Restituisce {nome: memoryview} con i byte di ogni colonna in un buffer scritto da salva()."""
+    vista = memoryview(dati)
+    blocchi = {}
+    offset = HEADER.size
+    for nome, codice in COLONNE:
+        dimensione = n * array(codice).itemsize
+        blocchi[nome] = vista[offset:offset + dimensione]
+        offset += dimensione
+    return blocchi
+
+
+class RisultatiColonnari:
+    def __init__(self):
+        self.colonne = {nome: array(codice) for nome, codice in COLONNE}
+        self._mmap = None
+
+    def __len__(self):
+        return len(self.colonne["riga"])
+
+    def aggiungi(self, record, canto=0):
+        flag = (FLAG_TRONCO if record["tronco"] else 0) | (FLAG_ENDECASILLABO if record["endecasillabo"] else 0)
+        self.colonne["riga"].append(record["riga"])
+        self.colonne["canto"].append(canto)
+        self.colonne["sillabe"].append(max(-128, min(127, record["sillabe"])))
+        self.colonne["sinalefe"].append(min(255, record["sinalefe"]))
+        self.colonne["flag"].append(flag)
+
+    @classmethod
+    def da_flusso(cls, records):
+        """
+        Costruisce il contenitore dai record di scansiona_flusso().
+        Le righe "CANTO ..." fanno avanzare il numero di canto e non vengono memorizzate.
+        """
+        risultati = cls()
+        canto = 0
+        for record in records:
+            if RE_CANTO.match(record["verso"]):
+                canto += 1
+                continue
+            risultati.aggiungi(record, canto)
+        return risultati
+
+    def vista(self, nome):
+        """
+        Colonna come array NumPy che condivide il buffer, anche quello mappato con mmap:
+        finché è in uso chiudi() non può liberare il file e solleva BufferError.
+        """
+        colonna = self.colonne[nome]
+        if not len(colonna):
+            return np.zeros(0, dtype=dict(COLONNE)[nome])
+        return np.frombuffer(colonna, dtype=dict(COLONNE)[nome])
+
+    def istogramma_sillabe(self):
+        """Restituisce {numero_sillabe: numero_versi}."""
+        # Le sillabe sono int8: spostate di 128 diventano indici validi per bincount
+        conteggi = np.bincount(self.vista("sillabe").astype(np.int16) + 128, minlength=256)
+        return {int(sillabe) - 128: int(conteggi[sillabe]) for sillabe in np.flatnonzero(conteggi)}
+
+    def quota_endecasillabi_per_canto(self):
+        """Restituisce {canto: quota di versi endecasillabi}."""
+        canti = self.vista("canto")
+        endecasillabo = (self.vista("flag") & FLAG_ENDECASILLABO) != 0
+        totali = np.bincount(canti)
+        endecasillabi = np.bincount(canti[endecasillabo], minlength=len(totali))
+        return {int(canto): float(endecasillabi[canto] / totali[canto]) for canto in np.flatnonzero(totali)}
+
+    def densita_sinalefe(self):
+        """Numero medio di sinalefe per verso."""
+        if not len(self):
+            return 0.0
+        return float(self.vista("sinalefe").sum(dtype=np.int64) / len(self))
+
+    def salva(self, percorso_file):
+        with open(percorso_file, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSIONE_FORMATO, len(self)))
+            for nome, codice in COLONNE:
+                colonna = self.colonne[nome]
+                if sys.byteorder == "big":
+                    colonna = array(codice, colonna)
+                    colonna.byteswap()
+                colonna.tofile(f)
+
+    @classmethod
+    def carica(cls, percorso_file, usa_mmap=True):
+        """
+        Riapre un file scritto con salva(). Con usa_mmap=True le colonne sono
+        memoryview di sola lettura sul file mappato in memoria.
+        """
+        risultati = cls()
+        with open(percorso_file, "rb") as f:
+            if usa_mmap:
+                dati = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                risultati._mmap = dati
+            else:
+                dati = f.read()
+        magic, versione, n = HEADER.unpack_from(dati, 0)
+        if magic != MAGIC or versione != VERSIONE_FORMATO:
+            raise ValueError(f"Formato non riconosciuto: {percorso_file}")
+        if sys.byteorder == "big" and usa_mmap:
+            raise ValueError("Il caricamento con mmap richiede una macchina little-endian")
+
+        blocchi = _blocchi_colonne(dati, n)
+        for nome, codice in COLONNE:
+            if usa_mmap:
+                risultati.colonne[nome] = blocchi[nome].cast(codice)
+            else:
+                colonna = array(codice)
+                colonna.frombytes(blocchi[nome])
+                if sys.byteorder == "big":
+                    colonna.byteswap()
+                risultati.colonne[nome] = colonna
+        return risultati
+
+    def chiudi(self):
+        """
+        Chiude il file mappato. Se una vista() è ancora in uso solleva BufferError
+        e le colonne restano leggibili sul file ancora aperto.
+        """
+        if self._mmap is None:
+            return
+        try:
+            # Le colonne sono memoryview sul file: vanno rilasciate perché mmap.close() riesca
+            for colonna in self.colonne.values():
+                colonna.release()
+            self._mmap.close()
+        except BufferError:
+            # Una colonna rilasciata non si può più leggere: si rimappano tutte sul file ancora aperto
+            blocchi = _blocchi_colonne(self._mmap, HEADER.unpack_from(self._mmap, 0)[2])
+            self.colonne = {nome: blocchi[nome].cast(codice) for nome, codice in COLONNE}
+            raise
+        self._mmap = None
+        self.colonne = {nome: array(codice) for nome, codice in COLONNE}
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Scansione metrica di un corpus su più processi.
+
+Il corpus (uno o più file) viene diviso in shard di righe consecutive e
+distribuito su un pool di processi. Ogni worker carica la pipeline spaCy e
+il lessico delle eccezioni una sola volta all'avvio e restituisce per ogni
+verso una tupla compatta di interi invece del doc spaCy; il processo
+principale ricompone i record nell'ordine di ingresso, identici a quelli di
+server.scansiona_flusso.
+
+Utilizzo (dalla cartella be):
+    python src/scansione_parallela.py ../commedia.txt [--processi 8] [--backend regole]
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing.util import Finalize
+
+import server
+from flusso_versi import apri_sorgente
+
+RIGHE_PER_SHARD = 2000
+
+# Stato del worker, impostato da _avvia_worker
+_backend = None
+_accenti = False
+
+
+def _avvia_worker(backend, accenti):
+    """Initializer del pool: carica una volta sola pipeline e lessici nel worker."""
+    global _backend, _accenti
+    _backend = backend
+    _accenti = accenti
+    if backend == "spacy":
+        server.get_nlp()
+    server.aggiorna_lessico()
+    if accenti:
+        server.LESSICO_ACCENTI.carica()
+    # I worker del pool escono senza passare da atexit: il memo si salva con i finalizzatori di multiprocessing
+    Finalize(None, server.salva_memo, exitpriority=0)
+
+
+def _scansiona_shard(righe, batch_size):
+    """
+    Scandisce uno shard nel worker.
+
+    Returns:
+        Lista di tuple (indice nello shard, sillabe, sinalefe, tronco[, ictus, uscita, tipo]);
+        il verso non viene rispedito perché il processo principale lo ha già
+    """
+    # Il numero di riga viene sostituito dall'indice nello shard, così la tupla resta piccola
+    indicizzate = ((i, verso) for i, (_, verso) in enumerate(righe))
+    compatti = []
+    for record in server.scansiona_righe(indicizzate, batch_size, 1, _backend, _accenti):
+        compatto = (record["riga"], record["sillabe"], record["sinalefe"], record["tronco"])
+        if _accenti:
+            compatto += (tuple(record["ictus"]), record["uscita"], record["tipo"])
+        compatti.append(compatto)
+    return compatti
+
+
+def _record(verso, numero, compatto, accenti):
+    _, sillabe, sinalefe, tronco = compatto[:4]
+    record = {
+        "riga": numero,
+        "verso": verso,
+        "sillabe": sillabe,
+        "sinalefe": sinalefe,
+        "tronco": tronco,
+        "endecasillabo": sillabe == 11
+    }
+    if accenti:
+        ictus, uscita, tipo = compatto[4:]
+        record.update({"ictus": list(ictus), "uscita": uscita, "tipo": tipo})
+    return record
+
+
+def _shard(sorgenti, righe_per_shard):
+    for sorgente in sorgenti:
+        righe = apri_sorgente(sorgente)
+        while True:
+            blocco = list(islice(righe, righe_per_shard))
+            if not blocco:
+                break
+            yield sorgente, blocco
+
+
+def scansiona_corpus(sorgenti, processi=None, righe_per_shard=RIGHE_PER_SHARD, batch_size=256,
+                     backend=None, accenti=False):
+    """
+    Scandisce uno o più file in parallelo mantenendo l'ordine di ingresso.
+
+    Al più due shard per processo sono in volo alla volta, quindi la memoria
+    resta limitata anche su corpus molto grandi.
+
+    Args:
+        sorgenti: Lista di sorgenti accettate da flusso_versi.apri_sorgente
+        processi: Numero di worker (default: os.cpu_count())
+        righe_per_shard: Righe consecutive assegnate a ogni task
+        batch_size: Numero di versi per batch inviati a spaCy nel worker
+        backend: "spacy" o "regole"
+        accenti: Se True aggiunge ictus, uscita e tipo di endecasillabo a ogni record
+
+    Returns:
+        Generatore di tuple (sorgente, record), con record come da server.scansiona_flusso
+    """
+    backend = backend or server.BACKEND_SILLABE
+    processi = processi or os.cpu_count() or 1
+    shard = _shard(sorgenti, righe_per_shard)
+    with ProcessPoolExecutor(max_workers=processi, initializer=_avvia_worker,
+                             initargs=(backend, accenti)) as pool:
+        in_volo = deque()
+        for sorgente, righe in islice(shard, 2 * processi):
+            in_volo.append((sorgente, righe, pool.submit(_scansiona_shard, righe, batch_size)))
+        while in_volo:
+            sorgente, righe, futuro = in_volo.popleft()
+            compatti = futuro.result()
+            for sorgente_succ, righe_succ in islice(shard, 1):
+                in_volo.append((sorgente_succ, righe_succ, pool.submit(_scansiona_shard, righe_succ, batch_size)))
+            for compatto in compatti:
+                numero, verso = righe[compatto[0]]
+                yield sorgente, _record(verso, numero, compatto, accenti)
+
+
+def scansiona_parallelo(sorgente, processi=None, righe_per_shard=RIGHE_PER_SHARD, batch_size=256,
+                        backend=None, accenti=False):
+    """Versione parallela di server.scansiona_flusso: stessi record, nello stesso ordine."""
+    for _, record in scansiona_corpus([sorgente], processi, righe_per_shard, batch_size, backend, accenti):
+        yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scansione metrica parallela di uno o più file")
+    parser.add_argument("file", nargs="+", help="File .txt/.html da scandire")
+    parser.add_argument("--processi", type=int, default=os.cpu_count())
+    parser.add_argument("--righe-per-shard", type=int, default=RIGHE_PER_SHARD)
+    parser.add_argument("--backend", default=server.BACKEND_SILLABE, choices=["spacy", "regole"])
+    parser.add_argument("--accenti", action="store_true")
+    args = parser.parse_args()
+
+    inizio = time.perf_counter()
+    versi = 0
+    endecasillabi = 0
+    for _, record in scansiona_corpus(args.file, args.processi, args.righe_per_shard,
+                                      backend=args.backend, accenti=args.accenti):
+        versi += 1
+        endecasillabi += record["endecasillabo"]
+    durata = time.perf_counter() - inizio
+    print(f"{versi} versi in {durata:.2f}s con {args.processi} processi "
+          f"({versi / durata:.0f} versi/s), endecasillabi: {endecasillabi / max(versi, 1):.2%}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
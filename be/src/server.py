@@ -1,54 +1,145 @@
-import re
+import hashlib
 import sqlite3
-import spacy
-from spacy_syllables import SpacySyllables
+import threading
+import time
+from itertools import islice
+from sillabazione import conta_sillabe_parola
+from tokenizzatore import VersoTokenizzato, doc_spacy, tokenizza_verso
+from memo_sillabe import MemoSillabe
+from cache_doc import CacheDoc, chiave_verso
+from lessico import LessicoRicaricabile, compila_lessico, init_lessico
+from flusso_versi import apri_sorgente
+from sinalefe_vettoriale import VOCALE, BatchSinalefe, codifica_token, conta_sinalefe_batch
+from accenti import LessicoAccenti, classifica_verso
+from rime import schema_rime
+from metriche import osserva_stadio
 
 # --- Configurazione SQLite per le eccezioni metriche ---
 DB_PATH = "eccezioni_metriche.db"
 locale = "it"
 
+# --- Configurazione spaCy ---
+MODELLO_SPACY = locale + "_core_news_sm"
+# La scansione usa solo il tokenizer e il componente syllables: il resto non viene caricato
+COMPONENTI_ESCLUSI = ["tok2vec", "morphologizer", "tagger", "parser", "lemmatizer", "attribute_ruler", "ner", "senter"]
+
+# Backend per il conteggio delle sillabe: "spacy" (SpacySyllables) o "regole" (sillabazione.py)
+BACKEND_SILLABE = "spacy"
+
+# Memo parola -> sillabe; se persistente vive nella tabella cache_sillabe accanto a eccezioni
+MEMO_CAPACITA = 50000
+MEMO_PERSISTENTE = False
+
+# Cache su disco dei doc spaCy (cache_doc.py); None per disattivarla
+CACHE_DOC_CARTELLA = None
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS eccezioni (
-            parola TEXT PRIMARY KEY,
-            sillabe INTEGER,
-            locale TEXT
-        )
-    """)
-    eccezioni_iniziali = {
-        "mio": 2,
-        "tuo": 2,
-        "suo": 2,
-        "l'amor": 2,
-        "d'amor": 2,
-        "ch'in": 2,
-        "un'amor": 2,
-        "io": 2,
-        "l'primo": 3,
-        "ch'intrate": 3,
-        "sapïenza": 4,
-    }
-    for parola, sillabe in eccezioni_iniziali.items():
-        cur.execute("INSERT OR IGNORE INTO eccezioni (parola, sillabe, locale) VALUES (?, ?, ?)", (parola, sillabe, locale))
-    conn.commit()
-    conn.close()
+    init_lessico(DB_PATH, locale)
 
 def load_eccezioni():
+    return compila_lessico(DB_PATH, locale)
+
+# Inizializzati al primo utilizzo da avvia_lessico(), così l'import del modulo resta leggero
+LESSICO = None
+ECCEZIONI = None
+MEMO = None
+LESSICO_ACCENTI = LessicoAccenti(DB_PATH)
+
+_nlp = None
+_cache_doc = None
+_lock_avvio = threading.Lock()
+
+def avvia_lessico():
+    global LESSICO, ECCEZIONI, MEMO
+    with _lock_avvio:
+        if LESSICO is None:
+            init_db()
+            lessico = LessicoRicaricabile(DB_PATH, locale)
+            MEMO = MemoSillabe(MEMO_CAPACITA, DB_PATH if MEMO_PERSISTENTE else None, lessico.lessico.impronta)
+            MEMO.carica()
+            ECCEZIONI = lessico.lessico
+            LESSICO = lessico
+
+def salva_memo():
+    """Scrive sul database le voci nuove del memo, se è già stato creato."""
+    if MEMO is not None:
+        MEMO.salva()
+
+def aggiorna_lessico():
+    """
+    Restituisce il lessico corrente, ricompilandolo se la tabella eccezioni è cambiata.
+    Chi ha già in mano il lessico precedente continua a usarlo fino alla fine del verso.
+    """
+    global ECCEZIONI
+    if LESSICO is None:
+        avvia_lessico()
+    lessico = LESSICO.corrente()
+    if lessico is not ECCEZIONI:
+        ECCEZIONI = lessico
+        MEMO.invalida(lessico.impronta)
+    return lessico
+
+def ricarica_eccezioni():
+    """Rilegge subito il lessico delle eccezioni e invalida il memo se è cambiato."""
+    if LESSICO is None:
+        avvia_lessico()
+    LESSICO.ricarica()
+    return aggiorna_lessico()
+
+def aggiungi_eccezione(parola, sillabe):
+    init_db()
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
-    cur.execute("SELECT parola, sillabe FROM eccezioni WHERE locale =?", (locale,))
-    rows = cur.fetchall()
+    cur.execute("INSERT OR REPLACE INTO eccezioni (parola, sillabe, locale) VALUES (?, ?, ?)", (parola, sillabe, locale))
+    conn.commit()
     conn.close()
-    return {row[0]: row[1] for row in rows}
+    ricarica_eccezioni()
 
-init_db()
-ECCEZIONI = load_eccezioni()
+def get_nlp():
+    """Carica la pipeline spaCy al primo utilizzo e la condivide tra tutte le analisi."""
+    global _nlp
+    if _nlp is None:
+        with _lock_avvio:
+            if _nlp is None:
+                import spacy
+                import spacy_syllables  # noqa: F401 - registra la factory "syllables"
+                nlp = spacy.load(MODELLO_SPACY, exclude=COMPONENTI_ESCLUSI)
+                nlp.add_pipe("syllables")
+                _nlp = nlp
+    return _nlp
+
+def get_cache_doc():
+    """Restituisce la cache dei doc analizzati, o None se CACHE_DOC_CARTELLA non è impostata."""
+    global _cache_doc
+    if CACHE_DOC_CARTELLA is None:
+        return None
+    if _cache_doc is None:
+        nlp = get_nlp()
+        with _lock_avvio:
+            if _cache_doc is None:
+                _cache_doc = CacheDoc(CACHE_DOC_CARTELLA, nlp)
+    return _cache_doc
+
+def __getattr__(nome):
+    # Compatibilità con chi usa ancora server.nlp
+    if nome == "nlp":
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+
+# Da aumentare quando cambiano le regole di conteggio: invalida le risposte in cache
+VERSIONE_MOTORE = 2
+
+def versione_motore(backend=None):
+    """
+    Identifica tutto ciò da cui dipende il risultato di un'analisi, per le cache delle risposte.
+    Legge i contatori dei lessici su SQLite: dall'event loop va chiamata in un thread.
+    """
+    backend = backend or BACKEND_SILLABE
+    eccezioni = aggiorna_lessico()
+    modello = MODELLO_SPACY if backend == "spacy" else ""
+    return f"{VERSIONE_MOTORE}:{backend}:{modello}:{eccezioni.impronta}:{LESSICO_ACCENTI.versione_corrente()}"
 
-nlp = spacy.load(locale + "_core_news_sm")
-syllables = SpacySyllables(nlp)
-nlp.add_pipe("syllables", after="tagger")
 
 poem = """Per me si va ne la città dolente,
 per me si va ne l'etterno dolore,
@@ -62,18 +153,57 @@ Dinanzi a me non fuor cose create
 se non etterne, e io etterno duro.
 Lasciate ogne speranza, voi ch'intrate."""
 
-def preprocess_text(text):
-    text = re.sub(r"\s+['’]", "'", text)
-    text = re.sub(r"\b(l|d|s|ch)['’]\s+", r"\1'", text)
-    return text
+VOCALI = "aeiouàèéìíòóùú"
+
+def conta_sillabe_spacy(testo):
+    nlp = get_nlp()
+    sillabatore = nlp.get_pipe("syllables")
+    doc = sillabatore(nlp.make_doc(testo))
+    return sum(token._.syllables_count or 0 for token in doc)
+
+def conta_sillabe_unite(token_text):
+    """
+    Sillabe di un token che spacy_syllables lascia senza conteggio perché non è alfabetico:
+    elisioni unite dal tokenizzatore ("l'acqua", "ch'i'", "v'ho") e accenti scritti con
+    l'apice inverso ("diro`"). Pyphen riceve la forma senza apostrofi e apici; un clitico
+    senza vocali ("'l") non ha sillabe proprie.
+    """
+    forma = "".join(c for c in token_text if c not in "'’`")
+    if not forma.isalpha() or not any(c in VOCALI for c in forma):
+        return 0
+    return len(get_nlp().get_pipe("syllables").syllables(forma))
 
-def conta_sillabe_token(token):
+def _conta_sillabe_testo(token, token_text, backend, eccezioni):
+    sillabe = eccezioni.get(token_text)
+    if sillabe is not None:
+        return sillabe
+    if backend == "regole":
+        sillabe, incerta = conta_sillabe_parola(token_text)
+        if not incerta:
+            return sillabe
+        # Parola ambigua: ricorre a spaCy, anche se il doc non è passato dalla pipeline
+        if token._.syllables_count is None:
+            return conta_sillabe_spacy(token_text)
+    if token._.syllables_count is None:
+        return conta_sillabe_unite(token_text)
+    return token._.syllables_count
+
+def conta_sillabe_token(token, backend=None, eccezioni=None):
     token_text = token.text.strip(" '’\".,;:!?").lower()
     if not token_text:
         return 0
-    if token_text in ECCEZIONI:
-        return ECCEZIONI[token_text]
-    return token._.syllables_count if token._.syllables_count else 0
+    backend = backend or BACKEND_SILLABE
+    if eccezioni is None:
+        eccezioni = aggiorna_lessico()
+    # Il memo vale solo per la versione del lessico con cui è stato riempito
+    if eccezioni.impronta != MEMO.versione:
+        return _conta_sillabe_testo(token, token_text, backend, eccezioni)
+    chiave = (token_text, backend)
+    sillabe = MEMO.get(chiave)
+    if sillabe is None:
+        sillabe = _conta_sillabe_testo(token, token_text, backend, eccezioni)
+        MEMO.put(chiave, sillabe)
+    return sillabe
 
 def conta_sinalefe_token(doc):
     vowels = "aeiouàèéìòóù"
@@ -91,23 +221,357 @@ def conta_sinalefe_token(doc):
             count += 1
     return count
 
-def conta_sillabe_corrette(doc):
-    totale_sillabe = sum(conta_sillabe_token(token) for token in doc)
-    num_sinalefe = conta_sinalefe_token(doc)
+def conta_verso(doc, backend=None, num_sinalefe=None):
+    """
+    Restituisce (totale_corretto, num_sinalefe, tronco) per un verso già tokenizzato.
+    Se num_sinalefe è già stato calcolato (es. da conta_sinalefe_batch) non viene ricontato.
+    """
+    eccezioni = aggiorna_lessico()
+    conteggi = [conta_sillabe_token(token, backend, eccezioni) for token in doc]
+    totale_sillabe = sum(conteggi)
+    if num_sinalefe is None:
+        num_sinalefe = conta_sinalefe_token(doc)
     totale_corretto = totale_sillabe - num_sinalefe
-    tokens_utili = [token for token in doc if conta_sillabe_token(token) > 0]
+    tronco = False
+    tokens_utili = [token for token, count in zip(doc, conteggi) if count > 0]
     if tokens_utili:
         ultimo = tokens_utili[-1].text.strip(" '’\".,;:!?")
         if ultimo and ultimo[-1] in "àéíóú":
             totale_corretto += 1
+            tronco = True
+    return totale_corretto, num_sinalefe, tronco
+
+def classifica_accenti(doc, backend=None):
+    """Restituisce ictus, uscita (piana/tronca/sdrucciola) e tipo di endecasillabo del verso."""
+    eccezioni = aggiorna_lessico()
+    conteggi = [conta_sillabe_token(token, backend, eccezioni) for token in doc]
+    codici = [codifica_token(token.text) for token in doc]
+    sinalefe = {i for i in range(len(codici) - 1) if codici[i][0] == VOCALE and codici[i + 1][1] == VOCALE}
+    return classifica_verso(LESSICO_ACCENTI, [token.text for token in doc], conteggi, sinalefe)
+
+def conta_sillabe_corrette(doc, backend=None):
+    totale_corretto, num_sinalefe, _ = conta_verso(doc, backend)
     return totale_corretto, num_sinalefe, doc
 
-for verso in poem.split("\n"):
-    if not verso.strip():
-        continue
-    verso_pre = preprocess_text(verso)
-    doc = nlp(verso_pre)
-    totale_corretto, num_sinalefe, doc = conta_sillabe_corrette(doc)
+def _parse_versi(coppie, batch_size, n_process, backend):
+    """
+    Tokenizza le coppie (verso, contesto) saltando i versi vuoti. Il verso viene diviso
+    una sola volta sugli offset originali (tokenizzatore.py): con backend "regole" spaCy
+    non interviene affatto, con "spacy" riceve un Doc già tokenizzato.
+    """
+    coppie = ((verso, (contesto, verso)) for verso, contesto in coppie if verso.strip())
+    if backend == "regole":
+        docs = ((VersoTokenizzato(verso), contesto) for verso, contesto in coppie)
+    elif get_cache_doc() is not None:
+        docs = _docs_da_cache(coppie, batch_size, n_process)
+    else:
+        nlp = get_nlp()
+        docs = nlp.pipe(((doc_spacy(nlp, verso), contesto) for verso, contesto in coppie),
+                        as_tuples=True, batch_size=batch_size, n_process=n_process)
+    for doc, (contesto, verso) in docs:
+        yield contesto, verso, doc
+
+def _docs_da_cache(coppie, batch_size, n_process):
+    """Prende dalla cache i doc già analizzati e passa da nlp.pipe solo i versi mancanti, mantenendo l'ordine."""
+    nlp = get_nlp()
+    cache = get_cache_doc()
+    try:
+        while True:
+            blocco = list(islice(coppie, batch_size))
+            if not blocco:
+                return
+            chiavi = [chiave_verso(verso) for verso, _ in blocco]
+            docs = cache.get_blocco(chiavi)
+            mancanti = [i for i, doc in enumerate(docs) if doc is None]
+            if mancanti:
+                nuovi = nlp.pipe((doc_spacy(nlp, blocco[i][0]) for i in mancanti),
+                                 batch_size=batch_size, n_process=n_process)
+                for i, doc in zip(mancanti, nuovi):
+                    cache.put(chiavi[i], doc)
+                    docs[i] = doc
+            for doc, (_, contesto) in zip(docs, blocco):
+                yield doc, contesto
+    finally:
+        cache.salva()
+
+def _stadio_parse(backend):
+    # Con "regole" il blocco passa solo dal tokenizzatore, con "spacy" anche dalla pipeline
+    return "tokenizzazione" if backend == "regole" else "parse_spacy"
+
+def _conta_versi_a_blocchi(coppie, batch_size, n_process, backend):
+    """
+    Come _parse_versi, ma lavora a blocchi di batch_size versi: sinalefe contate in blocco
+    con NumPy, poi sillabe verso per verso. Restituisce tuple
+    (contesto, verso, doc, totale_corretto, num_sinalefe, tronco).
+    """
+    parsati = _parse_versi(coppie, batch_size, n_process, backend)
+    try:
+        while True:
+            inizio = time.perf_counter()
+            blocco = list(islice(parsati, batch_size))
+            if not blocco:
+                return
+            osserva_stadio(_stadio_parse(backend), inizio)
+            inizio = time.perf_counter()
+            sinalefe = conta_sinalefe_batch(doc for _, _, doc in blocco)
+            osserva_stadio("sinalefe", inizio)
+            # Le metriche si registrano per blocco: una misura per verso peserebbe sul conteggio
+            inizio = time.perf_counter()
+            conteggi = [conta_verso(doc, backend, int(num_sinalefe)) for (_, _, doc), num_sinalefe in zip(blocco, sinalefe)]
+            osserva_stadio("conteggio_sillabe", inizio)
+            for (contesto, verso, doc), conteggio in zip(blocco, conteggi):
+                yield (contesto, verso, doc) + conteggio
+    finally:
+        salva_memo()
+
+def analizza_versi(versi, batch_size=64, n_process=1, backend=None):
+    """
+    Analizza in blocco un iterabile di versi passando per nlp.pipe.
+
+    Args:
+        versi: Iterabile di stringhe (un verso per elemento)
+        batch_size: Numero di versi per batch inviati a spaCy
+        n_process: Numero di processi usati da nlp.pipe
+        backend: "spacy" o "regole"; con "regole" il verso passa solo dal tokenizer
+
+    Returns:
+        Generatore di tuple (verso, totale_corretto, num_sinalefe, doc), una per verso non vuoto
+    """
+    backend = backend or BACKEND_SILLABE
+    coppie = ((verso, None) for verso in versi)
+    for _, verso, doc, totale_corretto, num_sinalefe, _ in _conta_versi_a_blocchi(coppie, batch_size, n_process, backend):
+        yield verso, totale_corretto, num_sinalefe, doc
+
+def scansiona_flusso(sorgente, batch_size=256, n_process=1, backend=None, accenti=False):
+    """
+    Scansione in streaming di un corpus di qualsiasi dimensione.
+
+    I versi vengono letti in modo pigro e i doc spaCy scartati subito dopo il conteggio,
+    quindi la memoria occupata non dipende dalla lunghezza del corpus.
+
+    Args:
+        sorgente: Percorso di un file .txt/.html, file aperto o iterabile di stringhe
+        batch_size: Numero di versi per batch inviati a spaCy
+        n_process: Numero di processi usati da nlp.pipe
+        backend: "spacy" o "regole"
+        accenti: Se True aggiunge ictus, uscita e tipo di endecasillabo a ogni record
+
+    Returns:
+        Generatore di dizionari, uno per verso non vuoto
+    """
+    return scansiona_righe(apri_sorgente(sorgente), batch_size, n_process, backend, accenti)
+
+def scansiona_righe(righe, batch_size=256, n_process=1, backend=None, accenti=False):
+    """Come scansiona_flusso, ma su tuple (numero_riga, verso) già lette (es. uno shard di scansione_parallela.py)."""
+    backend = backend or BACKEND_SILLABE
+    coppie = ((verso, numero) for numero, verso in righe)
+    for numero, verso, doc, totale_corretto, num_sinalefe, tronco in _conta_versi_a_blocchi(coppie, batch_size, n_process, backend):
+        record = {
+            "riga": numero,
+            "verso": verso,
+            "sillabe": totale_corretto,
+            "sinalefe": num_sinalefe,
+            "tronco": tronco,
+            "endecasillabo": totale_corretto == 11
+        }
+        if accenti:
+            record.update(classifica_accenti(doc, backend))
+        yield record
+
+def analizza_blocco(versi, backend=None):
+    """
+    Analizza una lista di versi con un solo passaggio da nlp.pipe, come serve all'API HTTP.
+
+    Args:
+        versi: Lista di stringhe
+        backend: "spacy" o "regole"
+
+    Returns:
+        Lista allineata a versi: None per i versi vuoti, altrimenti un dizionario con
+        sillabe, sinalefe (coppie di offset [fine parola, inizio parola seguente] nel verso),
+        tronco, endecasillabo, ictus, uscita e tipo
+    """
+    backend = backend or BACKEND_SILLABE
+    risultati = [None] * len(versi)
+    coppie = ((verso, i) for i, verso in enumerate(versi))
+    inizio = time.perf_counter()
+    parsati = list(_parse_versi(coppie, max(len(versi), 1), 1, backend))
+    osserva_stadio(_stadio_parse(backend), inizio)
+    inizio = time.perf_counter()
+    batch = BatchSinalefe()
+    for _, _, doc in parsati:
+        batch.aggiungi(doc)
+    posizioni_sinalefe = batch.posizioni()
+    osserva_stadio("sinalefe", inizio)
+    inizio = time.perf_counter()
+    try:
+        conteggi = [conta_verso(doc, backend, len(posizioni)) for (_, _, doc), posizioni in zip(parsati, posizioni_sinalefe)]
+    finally:
+        salva_memo()
+    osserva_stadio("conteggio_sillabe", inizio)
+    for (i, verso, doc), posizioni, (totale_corretto, num_sinalefe, tronco) in zip(parsati, posizioni_sinalefe, conteggi):
+        # I token del doc corrispondono uno a uno agli intervalli del tokenizzatore
+        intervalli = tokenizza_verso(verso)
+        risultati[i] = {
+            "verso": verso,
+            "sillabe": totale_corretto,
+            "sinalefe": [[intervalli[k][1], intervalli[k + 1][0]] for k in posizioni.tolist()],
+            "tronco": tronco,
+            "endecasillabo": totale_corretto == 11,
+            **classifica_accenti(doc, backend)
+        }
+    return risultati
+
+def analizza_rime(sorgente):
+    """
+    Etichetta lo schema delle rime di una poesia o di un intero corpus.
+
+    Args:
+        sorgente: Percorso di un file .txt/.html, file aperto o iterabile di stringhe
+
+    Returns:
+        Tupla (etichette per verso, strofe) come da rime.schema_rime
+    """
+    return schema_rime(apri_sorgente(sorgente), LESSICO_ACCENTI, aggiorna_lessico())
+
+def _intero(valore):
+    # bool è una sottoclasse di int, ma true/false in JSON non sono numeri di riga
+    return isinstance(valore, int) and not isinstance(valore, bool)
+
+class AnalizzatoreIncrementale:
+    """
+    Mantiene i risultati dell'ultima analisi di una poesia, indicizzati per hash del verso,
+    e rianalizza solo i versi nuovi o modificati.
+    """
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.risultati = {}
+        self.hash_per_posizione = []
+        # Stato per applica_modifiche: righe correnti e risultati di analizza_blocco per testo del verso
+        self.righe = []
+        self.schede = {}
+        # Dopo un cambio di lessico tutte le righe vanno rimandate, non solo quelle toccate
+        self.da_rinviare = False
+        aggiorna_lessico()
+        self.versione_lessico = MEMO.versione
+
+    def _controlla_lessico(self):
+        aggiorna_lessico()
+        if self.versione_lessico != MEMO.versione:
+            # Il lessico delle eccezioni è cambiato: i conteggi precedenti non valgono più
+            self.risultati.clear()
+            self.schede.clear()
+            self.hash_per_posizione = []
+            self.da_rinviare = True
+            self.versione_lessico = MEMO.versione
+
+    def aggiorna(self, testo):
+        """
+        Args:
+            testo: Il testo completo della poesia, un verso per riga
+
+        Returns:
+            Tupla con la lista di risultati (posizione, verso, totale_corretto, num_sinalefe, doc)
+            per i versi non vuoti e la lista delle posizioni rianalizzate
+        """
+        self._controlla_lessico()
+
+        versi = testo.split("\n")
+        hash_versi = [hashlib.sha1(verso.encode("utf-8")).hexdigest() for verso in versi]
+        da_analizzare = {}
+        for verso, h in zip(versi, hash_versi):
+            if verso.strip() and h not in self.risultati:
+                da_analizzare[h] = verso
+        for h, risultato in zip(da_analizzare, analizza_versi(da_analizzare.values(), backend=self.backend)):
+            self.risultati[h] = risultato
+
+        risultati = []
+        modificate = []
+        for posizione, (verso, h) in enumerate(zip(versi, hash_versi)):
+            if not verso.strip():
+                continue
+            if posizione >= len(self.hash_per_posizione) or self.hash_per_posizione[posizione] != h:
+                modificate.append(posizione)
+            _, totale_corretto, num_sinalefe, doc = self.risultati[h]
+            risultati.append((posizione, verso, totale_corretto, num_sinalefe, doc))
+
+        # Tiene solo i risultati dei versi ancora presenti
+        presenti = set(hash_versi)
+        for h in [h for h in self.risultati if h not in presenti]:
+            del self.risultati[h]
+        self.hash_per_posizione = hash_versi
+        return risultati, modificate
+
+    def applica_modifiche(self, modifiche, analizza=None):
+        """
+        Applica le modifiche per righe inviate da un editor e rianalizza solo le righe toccate.
+
+        Args:
+            modifiche: Lista di (inizio, fine, righe), applicate in ordine: le righe
+                [inizio, fine) del testo corrente vengono sostituite da righe (fine None
+                indica la fine del testo)
+            analizza: Funzione lista di versi -> risultati allineati, come analizza_blocco
+                (predefinita); i versi già visti non le vengono ripassati
+
+        Returns:
+            Tupla (numero di righe del testo, {posizione: risultato} per le righe toccate,
+            con None per quelle vuote); dopo un cambio del lessico contiene tutte le righe
+
+        Raises:
+            ValueError: Se una modifica non è valida o esce dal testo; in quel caso nessuna
+                delle modifiche viene applicata
+        """
+        self._controlla_lessico()
+
+        # Le modifiche si applicano a una copia, che sostituisce il testo solo se tutto va a buon fine
+        testo = list(self.righe)
+        toccate = set()
+        for inizio, fine, righe in modifiche:
+            if not _intero(inizio) or not (fine is None or _intero(fine)):
+                raise ValueError(f"Modifica con limiti non interi: [{inizio!r}, {fine!r})")
+            if not isinstance(righe, list) or not all(isinstance(riga, str) for riga in righe):
+                raise ValueError("Le righe di una modifica devono essere una lista di stringhe")
+            if fine is None:
+                fine = len(testo)
+            if not 0 <= inizio <= fine <= len(testo):
+                raise ValueError(f"Modifica [{inizio}, {fine}) fuori dal testo di {len(testo)} righe")
+            testo[inizio:fine] = righe
+            # Le righe toccate prima di questa modifica si spostano con il testo che segue
+            scarto = len(righe) - (fine - inizio)
+            toccate = {p if p < inizio else p + scarto for p in toccate if p < inizio or p >= fine}
+            toccate.update(range(inizio, inizio + len(righe)))
+        if self.da_rinviare:
+            toccate = set(range(len(testo)))
+
+        nuovi = list(dict.fromkeys(
+            testo[p] for p in toccate if testo[p].strip() and testo[p] not in self.schede
+        ))
+        if nuovi:
+            analizza = analizza or (lambda versi: analizza_blocco(versi, self.backend))
+            self.schede.update(zip(nuovi, analizza(nuovi)))
+        self.righe = testo
+        self.da_rinviare = False
+        risultati = {p: self.schede.get(self.righe[p]) for p in sorted(toccate)}
+
+        if len(self.schede) > 2 * len(self.righe) + 64:
+            # Tiene solo i risultati dei versi ancora presenti
+            presenti = set(self.righe)
+            self.schede = {verso: scheda for verso, scheda in self.schede.items() if verso in presenti}
+        return len(self.righe), risultati
+
+def riscalda(verso="Nel mezzo del cammin di nostra vita"):
+    """
+    Carica pipeline spaCy e lessici e analizza un verso di prova con entrambi i backend,
+    così il costo del primo utilizzo non ricade su una richiesta reale.
+    """
+    get_nlp()
+    aggiorna_lessico()
+    for backend in ("spacy", "regole"):
+        for _ in analizza_versi([verso], backend=backend):
+            pass
+    LESSICO_ACCENTI.carica()
+
+def stampa_analisi(totale_corretto, num_sinalefe, doc):
     print("\nAnalisi per parola:")
     for token in doc:
         count = conta_sillabe_token(token)
@@ -118,3 +582,7 @@ for verso in poem.split("\n"):
     print(f"\nTotale sillabe nel verso (corretto per sinalefe e tronche): {totale_corretto}")
     print(f"Numero di sinalefe rilevate: {num_sinalefe}")
     print("È un endecasillabo?", totale_corretto == 11)
+
+if __name__ == "__main__":
+    for verso, totale_corretto, num_sinalefe, doc in analizza_versi(poem.split("\n")):
+        stampa_analisi(totale_corretto, num_sinalefe, doc)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Sillabazione italiana a regole, in puro Python.
+
+Serve come percorso veloce per il conteggio delle sillabe: lavora solo sulla
+forma superficiale della parola, senza passare dalla pipeline spaCy.
+Quando un gruppo vocalico non si può risolvere con certezza (es. "mio", "via",
+"paura") la parola viene segnalata come ambigua e il chiamante può ricorrere
+al conteggio di spaCy.
+"""
+
+from typing import List, Tuple
+
+VOCALI_FORTI = "aeoàèéòó"
+VOCALI_DEBOLI = "iu"
+VOCALI_ACCENTATE_DEBOLI = "ìíùú"
+VOCALI_DIERESI = "ïü"
+VOCALI_ACCENTATE = "àèéòó" + VOCALI_ACCENTATE_DEBOLI
+VOCALI = VOCALI_FORTI + VOCALI_DEBOLI + VOCALI_ACCENTATE_DEBOLI + VOCALI_DIERESI
+
+APOSTROFI = "'’"
+PUNTEGGIATURA = " \"`.,;:!?«»()-"
+
+# Accenti scritti con l'apice inverso, come in commedia.txt ("e`", "piu`")
+ACCENTI_APICE = {"a`": "à", "e`": "è", "i`": "ì", "o`": "ò", "u`": "ù"}
+
+# Dittonghi ascendenti quasi sempre tonici sulla seconda vocale (piede, buono, cuore)
+DITTONGHI_SICURI = {"ie", "iè", "ié", "uo", "uò", "uó"}
+
+# Gruppi consonantici indivisibili davanti a vocale
+NESSI_INDIVISIBILI = {"ch", "gh", "gn", "gl", "sc"}
+MUTE = "bcdfgkptv"
+LIQUIDE = "lr"
+
+
+def normalizza_parola(parola: str) -> str:
+    """
+    Porta la parola in minuscolo, converte gli accenti con apice inverso
+    e rimuove la punteggiatura ai bordi.
+    """
+    parola = parola.lower()
+    for apice, accentata in ACCENTI_APICE.items():
+        parola = parola.replace(apice, accentata)
+    return parola.strip(PUNTEGGIATURA)
+
+
+def _nuclei(segmento: str) -> Tuple[List[Tuple[int, int]], bool]:
+    """
+    Individua i nuclei vocalici di un segmento senza apostrofi.
+
+    Returns:
+        Tupla con la lista di intervalli (inizio, fine) dei nuclei e un flag
+        che indica se la divisione dipende dall'accento e non è certa
+    """
+    nuclei = []
+    incerti = []
+    i = 0
+    while i < len(segmento):
+        if segmento[i] not in VOCALI:
+            i += 1
+            continue
+        inizio = i
+        # L'h muta tra vocale forte e i/u finale non separa le sillabe (ahi, ohi, ehi)
+        while i < len(segmento) and (segmento[i] in VOCALI or (
+                segmento[i] == "h" and segmento[i - 1] in VOCALI_FORTI and segmento[i + 1:] in ("i", "u"))):
+            i += 1
+        gruppo = segmento[inizio:i]
+        precedente = segmento[max(0, inizio - 2):inizio]
+
+        # "i" diacritica o semivocale (cia, gio, scie, chiaro, figlio) e "u" semivocale (qua, guerra)
+        semivocale = len(gruppo) > 1 and (
+            (gruppo[0] == "i" and (precedente[-1:] in ("c", "g") or precedente in ("ch", "gh", "gl")))
+            or (gruppo[0] == "u" and precedente[-1:] in ("q", "g"))
+        )
+
+        inizio_nucleo = inizio
+        # Posizioni delle i/u tra due vocali: sono consonantiche e aprono una sillaba (gio-ia, no-ia, a-iuo-la)
+        intervocaliche = set()
+        for j in range(inizio + 1, i + 1):
+            if j < i:
+                if semivocale and j == inizio + 1:
+                    continue
+                corrente, successiva = segmento[j - 1], segmento[j]
+                if (successiva in VOCALI_DEBOLI and j + 1 < i and segmento[j + 1] in VOCALI
+                        and j - 1 not in intervocaliche):
+                    intervocaliche.add(j)
+                iato = (
+                    j in intervocaliche
+                    or (corrente in VOCALI_FORTI and successiva in VOCALI_FORTI)
+                    or corrente in VOCALI_DIERESI
+                    or successiva in VOCALI_DIERESI
+                    or corrente in VOCALI_ACCENTATE_DEBOLI
+                    or (successiva in VOCALI_ACCENTATE_DEBOLI and corrente in VOCALI_FORTI)
+                )
+                if not iato:
+                    continue
+            nucleo = segmento[inizio_nucleo:j]
+            # La semivocale iniziale (diacritica o intervocalica) non fa parte del gruppo da valutare
+            if (semivocale and inizio_nucleo == inizio) or inizio_nucleo in intervocaliche:
+                nucleo = nucleo[1:]
+            discendente_finale = (
+                j == len(segmento) and len(nucleo) > 1 and nucleo[0] in VOCALI_FORTI and nucleo[-1] in VOCALI_DEBOLI
+            )
+            incerti.append(
+                len(nucleo) > 1
+                and nucleo not in DITTONGHI_SICURI
+                and not any(c in VOCALI_ACCENTATE for c in nucleo)
+                and not discendente_finale
+            )
+            nuclei.append((inizio_nucleo, j))
+            inizio_nucleo = j
+
+    # L'accento cade di norma sulla penultima o sull'ultima sillaba:
+    # solo lì un dittongo può nascondere uno iato (mì-o, pa-ù-ra)
+    return nuclei, any(incerti[-2:])
+
+
+def _punto_di_taglio(consonanti: str) -> int:
+    """Restituisce quante consonanti restano nella sillaba precedente."""
+    if len(consonanti) <= 1:
+        return 0
+    if consonanti[0] == consonanti[1] or consonanti[:2] == "cq":
+        return 1
+    if consonanti[0] == "s" or consonanti[:2] in NESSI_INDIVISIBILI:
+        return 0
+    if consonanti[0] in MUTE and consonanti[1] in LIQUIDE:
+        return 0
+    return 1
+
+
+def _sillaba_segmento(segmento: str) -> Tuple[List[str], bool]:
+    nuclei, incerta = _nuclei(segmento)
+    if not nuclei:
+        return ([segmento] if segmento else []), False
+
+    sillabe = []
+    inizio = 0
+    for k in range(len(nuclei) - 1):
+        fine_nucleo = nuclei[k][1]
+        inizio_prossimo = nuclei[k + 1][0]
+        taglio = fine_nucleo + _punto_di_taglio(segmento[fine_nucleo:inizio_prossimo])
+        sillabe.append(segmento[inizio:taglio])
+        inizio = taglio
+    sillabe.append(segmento[inizio:])
+    return sillabe, incerta
+
+
+def sillaba_parola(parola: str) -> Tuple[List[str], bool]:
+    """
+    Divide una parola italiana in sillabe.
+
+    Gestisce dittonghi, iati, la dieresi ("sapïenza") e le elisioni
+    ("l'amor", "ch'intrate", "'l").
+
+    Args:
+        parola: La parola da sillabare, anche con punteggiatura ai bordi
+
+    Returns:
+        Tupla con la lista delle sillabe e un flag che indica se il conteggio
+        è ambiguo e conviene verificarlo con un altro sillabatore
+    """
+    parola = normalizza_parola(parola)
+    sillabe = []
+    incerta = False
+    in_sospeso = ""
+    for segmento in filter(None, (parola.translate({ord(a): "'" for a in APOSTROFI})).split("'")):
+        parti, incerta_parte = _sillaba_segmento(segmento)
+        incerta = incerta or incerta_parte
+        if not any(c in VOCALI for c in segmento):
+            # Clitico eliso senza vocale ("l'", "d'", "'l"): si appoggia alla parola vicina
+            in_sospeso += segmento + "'"
+            continue
+        parti[0] = in_sospeso + parti[0]
+        in_sospeso = ""
+        sillabe.extend(parti)
+    if in_sospeso and sillabe:
+        sillabe[-1] += "'" + in_sospeso.rstrip("'")
+    return sillabe, incerta
+
+
+def conta_sillabe_parola(parola: str) -> Tuple[int, bool]:
+    """
+    Conta le sillabe di una parola con le sole regole ortografiche.
+
+    Returns:
+        Tupla con il numero di sillabe e il flag di ambiguità
+    """
+    sillabe, incerta = sillaba_parola(parola)
+    return len(sillabe), incerta
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Conteggio delle sinalefe su molti versi insieme.
+
+Ogni token viene ridotto a due piccoli interi: la classe dell'ultimo carattere
+e quella del primo (dopo aver tolto l'h muta). I token vuoti dopo lo strip
+(punteggiatura) valgono 0 e fanno da barriera. Le sinalefe di migliaia di
+versi si ottengono poi con poche maschere NumPy, con le stesse regole di
+conta_sinalefe_token() in server.py.
+"""
+
+import numpy as np
+
+VOCALI = "aeiouàèéìòóù"
+CARATTERI_STRIP = " '’\".,;:!?"
+
+BARRIERA = 0
+VOCALE = 1
+CONSONANTE = 2
+
+
+def codifica_token(testo):
+    """Restituisce (classe_ultimo, classe_primo) per il testo di un token."""
+    pulito = testo.strip(CARATTERI_STRIP).lower()
+    if not pulito:
+        return BARRIERA, BARRIERA
+    ultimo = VOCALE if pulito[-1] in VOCALI else CONSONANTE
+    if pulito[0] == "h" and len(pulito) > 1 and pulito[1] in VOCALI:
+        primo = VOCALE
+    else:
+        primo = VOCALE if pulito[0] in VOCALI else CONSONANTE
+    return ultimo, primo
+
+
+class BatchSinalefe:
+    """Accumula i confini dei token di più versi e conta le sinalefe in un colpo solo."""
+
+    def __init__(self):
+        self.fine = []
+        self.inizio = []
+        self.verso = []
+        self.num_versi = 0
+
+    def aggiungi(self, testi_token):
+        """Aggiunge un verso dato come sequenza di testi dei token (o un doc spaCy)."""
+        for token in testi_token:
+            ultimo, primo = codifica_token(getattr(token, "text", token))
+            self.fine.append(ultimo)
+            self.inizio.append(primo)
+            self.verso.append(self.num_versi)
+        self.num_versi += 1
+
+    def _maschera(self):
+        fine = np.asarray(self.fine, dtype=np.int8)
+        inizio = np.asarray(self.inizio, dtype=np.int8)
+        verso = np.asarray(self.verso, dtype=np.int32)
+        maschera = (fine[:-1] == VOCALE) & (inizio[1:] == VOCALE) & (verso[:-1] == verso[1:])
+        return maschera, verso
+
+    def conta(self):
+        """Restituisce un array con il numero di sinalefe di ciascun verso."""
+        if len(self.fine) < 2:
+            return np.zeros(self.num_versi, dtype=np.int32)
+        maschera, verso = self._maschera()
+        return np.bincount(verso[:-1][maschera], minlength=self.num_versi).astype(np.int32)
+
+    def posizioni(self):
+        """
+        Restituisce, per ogni verso, l'array degli indici i dei token
+        tra cui (i, i+1) cade una sinalefa.
+        """
+        if len(self.fine) < 2:
+            return [np.zeros(0, dtype=np.int32) for _ in range(self.num_versi)]
+        maschera, verso = self._maschera()
+        globali = np.flatnonzero(maschera)
+        inizio_verso = np.searchsorted(verso, np.arange(self.num_versi + 1))
+        tagli = np.searchsorted(globali, inizio_verso)
+        return [
+            (globali[tagli[k]:tagli[k + 1]] - inizio_verso[k]).astype(np.int32)
+            for k in range(self.num_versi)
+        ]
+
+
+def conta_sinalefe_batch(versi_token):
+    """
+    Args:
+        versi_token: Iterabile di versi, ciascuno come doc spaCy o sequenza di testi dei token
+
+    Returns:
+        Array NumPy con il numero di sinalefe per verso
+    """
+    batch = BatchSinalefe()
+    for testi_token in versi_token:
+        batch.aggiungi(testi_token)
+    return batch.conta()
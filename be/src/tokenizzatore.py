@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tokenizzatore per i versi italiani con elisioni e apocopi.
+
+Lavora su offset di caratteri nel verso originale invece di riscriverlo con
+le espressioni regolari: ogni token è un intervallo (inizio, fine). Le
+elisioni diventano un solo token ("l'amor", "ch'intrate", anche se scritte
+"l' amor"), l'articolo apocopato resta un token a sé ("e 'l primo") e ogni
+segno di punteggiatura fa da barriera per le sinalefe.
+"""
+
+APOSTROFI = "'’"
+
+# Clitici elisi che si uniscono alla parola seguente anche se separati da uno spazio
+CLITICI = {"l", "d", "s", "ch"}
+
+
+def _carattere_parola(verso, j):
+    c = verso[j]
+    # L'apice inverso dopo una vocale vale come accento ("e`", "piu`")
+    return c.isalnum() or (c == "`" and j > 0 and verso[j - 1].isalpha())
+
+
+def _fine_parola(verso, j):
+    n = len(verso)
+    while j < n and _carattere_parola(verso, j):
+        j += 1
+    return j
+
+
+def tokenizza_verso(verso):
+    """
+    Args:
+        verso: Il verso originale, senza modifiche
+
+    Returns:
+        Lista di tuple (inizio, fine, unito) sugli offset del verso; unito è True
+        se il token comprende uno spazio (clitico staccato: "l' amor")
+    """
+    token = []
+    n = len(verso)
+    i = 0
+    while i < n:
+        c = verso[i]
+        if c.isspace():
+            i += 1
+            continue
+        if c in APOSTROFI:
+            # Apocope ("'l") o apostrofo isolato
+            j = _fine_parola(verso, i + 1)
+            token.append((i, j, False))
+            i = j
+            continue
+        if not _carattere_parola(verso, i):
+            token.append((i, i + 1, False))
+            i += 1
+            continue
+
+        inizio_segmento = i
+        j = _fine_parola(verso, i)
+        unito = False
+        while j < n and verso[j] in APOSTROFI:
+            k = j + 1
+            if k < n and _carattere_parola(verso, k):
+                # Elisione attaccata: l'amor, un'amor, ch'i'
+                inizio_segmento = k
+                j = _fine_parola(verso, k)
+                continue
+            m = k
+            while m < n and verso[m].isspace():
+                m += 1
+            if m > k and m < n and _carattere_parola(verso, m) and verso[inizio_segmento:j].lower() in CLITICI:
+                # Clitico eliso staccato dalla parola seguente: l' amor
+                inizio_segmento = m
+                j = _fine_parola(verso, m)
+                unito = True
+                continue
+            # Apostrofo finale di troncamento (tant', com')
+            j = k
+            break
+        token.append((i, j, unito))
+        i = j
+    return token
+
+
+class _EstensioniVuote:
+    """Sostituisce token._ per i token che non sono passati da spaCy."""
+    __slots__ = ()
+    syllables = None
+    syllables_count = None
+
+
+ESTENSIONI_VUOTE = _EstensioniVuote()
+
+
+class TokenVerso:
+    """Token definito da offset nel verso, con la stessa interfaccia minima di un token spaCy."""
+    __slots__ = ("verso", "inizio", "fine", "unito")
+    _ = ESTENSIONI_VUOTE
+
+    def __init__(self, verso, inizio, fine, unito=False):
+        self.verso = verso
+        self.inizio = inizio
+        self.fine = fine
+        self.unito = unito
+
+    @property
+    def text(self):
+        testo = self.verso[self.inizio:self.fine]
+        return "".join(testo.split()) if self.unito else testo
+
+    def __repr__(self):
+        return self.text
+
+
+class VersoTokenizzato:
+    """Sequenza di TokenVerso, usabile al posto di un doc spaCy dai contatori di server.py."""
+    __slots__ = ("text", "token")
+
+    def __init__(self, verso):
+        self.text = verso
+        self.token = [TokenVerso(verso, inizio, fine, unito) for inizio, fine, unito in tokenizza_verso(verso)]
+
+    def __iter__(self):
+        return iter(self.token)
+
+    def __len__(self):
+        return len(self.token)
+
+    def __getitem__(self, indice):
+        return self.token[indice]
+
+
+def doc_spacy(nlp, verso):
+    """Costruisce un Doc spaCy già tokenizzato, senza passare dal tokenizer del modello."""
+    from spacy.tokens import Doc
+
+    parole = []
+    spazi = []
+    for inizio, fine, unito in tokenizza_verso(verso):
+        testo = verso[inizio:fine]
+        parole.append("".join(testo.split()) if unito else testo)
+        spazi.append(fine < len(verso) and verso[fine].isspace())
+    return Doc(nlp.vocab, words=parole, spaces=spazi)
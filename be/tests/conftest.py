@@ -0,0 +1,5 @@
+import os
+import sys
+
+# I moduli di be/src si importano come script (from sillabazione import ...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
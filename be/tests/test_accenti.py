@@ -0,0 +1,13 @@
+import accenti
+
+
+def test_sinalefe_tra_toniche_un_solo_ictus(tmp_path):
+    db_path = str(tmp_path / "accenti.db")
+    accenti.init_accenti(db_path)
+    lessico = accenti.LessicoAccenti(db_path)
+    # "che la diritta via era smarrita" con via monosillabo: via ed era si fondono nella sesta sillaba
+    testi = ["che", "la", "diritta", "via", "era", "smarrita"]
+    conteggi = [1, 1, 3, 1, 2, 3]
+    risultato = accenti.classifica_verso(lessico, testi, conteggi, {3})
+    assert risultato["ictus"] == [4, 6, 9]
+    assert risultato["uscita"] == "piana"
@@ -0,0 +1,37 @@
+import pytest
+
+from codifica_risposte import codifica, comprimi_indici, compatta_els, decodifica, decomprimi_indici, espandi_els
+
+
+@pytest.mark.parametrize("indici", [
+    [],
+    [0],
+    [5, 3, 3, 10, 0],
+    [127, 128, 16383, 16384, 2 ** 40, -1, -(2 ** 40)],
+    list(range(0, 100000, 37)),
+])
+@pytest.mark.parametrize("binario", [True, False])
+def test_indici_andata_e_ritorno(indici, binario):
+    assert decomprimi_indici(comprimi_indici(indici, binario)) == indici
+
+
+def risultati_els():
+    return {
+        "Capitolo primo": {
+            "testo": "nel mezzo del cammin",
+            "indici_saltatoria": [3, 53, 103, 153],
+            "indici_semantici": [],
+            "dettagli_semantici": {
+                "amore": [[50, 3, [3, 53, 103, 153, 203]], [75, 10, [10, 85, 160, 235, 310]]],
+                "luce": [[-20, 400, [400, 380, 360, 340]]],
+                "selva": [],
+            },
+        },
+        "Capitolo secondo": {"testo": "", "indici_saltatoria": [], "dettagli_semantici": {}},
+    }
+
+
+@pytest.mark.parametrize("formato", ["json", "msgpack"])
+def test_els_andata_e_ritorno(formato):
+    compatti = compatta_els(risultati_els(), binario=formato == "msgpack")
+    assert espandi_els(decodifica(codifica(compatti, formato), formato)) == risultati_els()
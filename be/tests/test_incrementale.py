@@ -0,0 +1,38 @@
+import pytest
+
+import server
+
+
+@pytest.fixture
+def analizzatore(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "DB_PATH", str(tmp_path / "lessico.db"))
+    for nome in ("LESSICO", "ECCEZIONI", "MEMO"):
+        monkeypatch.setattr(server, nome, None)
+    return server.AnalizzatoreIncrementale(backend="regole")
+
+
+def analizza(versi):
+    return [{"verso": verso} for verso in versi]
+
+
+def test_cambio_lessico_rinvia_tutte_le_righe(analizzatore):
+    analizzatore.applica_modifiche([(0, None, ["Nel mezzo", "del cammin", "di nostra vita"])], analizza)
+    _, risultati = analizzatore.applica_modifiche([(1, 2, ["del cammino"])], analizza)
+    assert list(risultati) == [1]
+
+    server.aggiungi_eccezione("cammino", 3)
+    _, risultati = analizzatore.applica_modifiche([(2, 3, ["di nostra vita!"])], analizza)
+    assert list(risultati) == [0, 1, 2]
+    assert all(risultato is not None for risultato in risultati.values())
+
+    _, risultati = analizzatore.applica_modifiche([(0, 1, ["Nel mezzo!"])], analizza)
+    assert list(risultati) == [0]
+
+
+def test_modifica_non_valida_non_perde_il_rinvio(analizzatore):
+    analizzatore.applica_modifiche([(0, None, ["Nel mezzo", "del cammin"])], analizza)
+    server.aggiungi_eccezione("cammino", 3)
+    with pytest.raises(ValueError):
+        analizzatore.applica_modifiche([(5, 6, ["fuori"])], analizza)
+    _, risultati = analizzatore.applica_modifiche([(1, 2, ["del cammino"])], analizza)
+    assert list(risultati) == [0, 1]
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+import accenti
+import lessico
+import rime
+from flusso_versi import apri_sorgente
+from risultati_colonnari import RE_CANTO
+
+COMMEDIA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "commedia.txt")
+
+
+@pytest.fixture(scope="module")
+def lessici(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("rime") / "lessico.db")
+    lessico.init_lessico(db_path, "it")
+    accenti.init_accenti(db_path)
+    return accenti.LessicoAccenti(db_path), lessico.compila_lessico(db_path, "it")
+
+
+def canti():
+    """Divide commedia.txt in canti, ognuno come lista di (numero_riga, verso)."""
+    canti = []
+    for numero, verso in apri_sorgente(COMMEDIA):
+        if RE_CANTO.match(verso):
+            canti.append([])
+        if canti:
+            canti[-1].append((numero, verso))
+    return canti
+
+
+@pytest.mark.parametrize("parola, coda", [
+    ("mio", "io"), ("io", "io"), ("Dio", "io"), ("via", "ia"),
+    ("lui", "ui"), ("fui", "ui"), ("colui", "ui"), ("qui", "i"),
+    ("dolente", "ente"), ("però", "o"), ("famiglia", "iglia"), ("figliuolo", "olo"),
+])
+def test_coda_iato_finale(lessici, parola, coda):
+    assert rime.coda_rima(parola, *lessici) == coda
+
+
+@pytest.mark.skipif(not os.path.exists(COMMEDIA), reason="commedia.txt non disponibile")
+def test_terza_rima_commedia(lessici):
+    corretti = totale = canti_in_terza_rima = 0
+    for canto in canti():
+        _, strofe = rime.schema_rime(canto, *lessici)
+        c, t = rime.accuratezza_terza_rima(strofe)
+        corretti += c
+        totale += t
+        canti_in_terza_rima += rime.e_terza_rima(strofe)
+    assert totale > 1000
+    assert corretti / totale >= 0.97
+    assert canti_in_terza_rima >= 15
@@ -0,0 +1,32 @@
+import pytest
+
+from risultati_colonnari import RisultatiColonnari
+
+
+@pytest.fixture
+def percorso(tmp_path):
+    risultati = RisultatiColonnari()
+    for riga in range(10):
+        risultati.aggiungi({"riga": riga, "sillabe": 11, "sinalefe": 1, "tronco": False, "endecasillabo": True}, 1)
+    percorso = tmp_path / "risultati.bin"
+    risultati.salva(percorso)
+    return percorso
+
+
+def test_chiudi_con_vista_in_uso_lascia_le_colonne_leggibili(percorso):
+    risultati = RisultatiColonnari.carica(percorso)
+    vista = risultati.vista("sillabe")
+    with pytest.raises(BufferError):
+        risultati.chiudi()
+    assert len(risultati) == 10
+    assert risultati.istogramma_sillabe() == {11: 10}
+    del vista
+    risultati.chiudi()
+    assert len(risultati) == 0
+
+
+def test_carica_con_e_senza_mmap(percorso):
+    mappati = RisultatiColonnari.carica(percorso)
+    copiati = RisultatiColonnari.carica(percorso, usa_mmap=False)
+    assert mappati.quota_endecasillabi_per_canto() == copiati.quota_endecasillabi_per_canto() == {1: 1.0}
+    mappati.chiudi()
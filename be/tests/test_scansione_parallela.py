@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+import accenti
+import scansione_parallela
+import server
+
+COMMEDIA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "commedia.txt")
+
+# Anche con backend "regole" le parole ambigue passano dal sillabatore di spaCy
+pytestmark = [
+    pytest.mark.skipif(not os.path.exists(COMMEDIA), reason="commedia.txt non disponibile"),
+    pytest.mark.skipif(not pytest.importorskip("spacy").util.is_package(server.MODELLO_SPACY),
+                       reason=f"modello {server.MODELLO_SPACY} non installato"),
+]
+
+
+@pytest.fixture
+def lessico_temporaneo(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "DB_PATH", str(tmp_path / "lessico.db"))
+    for nome in ("LESSICO", "ECCEZIONI", "MEMO"):
+        monkeypatch.setattr(server, nome, None)
+    monkeypatch.setattr(server, "LESSICO_ACCENTI", accenti.LessicoAccenti(server.DB_PATH))
+
+
+@pytest.mark.parametrize("accenti", [False, True])
+def test_parallelo_uguale_a_un_processo(lessico_temporaneo, accenti):
+    attesi = list(server.scansiona_flusso(COMMEDIA, backend="regole", accenti=accenti))
+    ottenuti = [record for _, record in scansione_parallela.scansiona_corpus(
+        [COMMEDIA], processi=2, righe_per_shard=700, backend="regole", accenti=accenti)]
+    assert ottenuti == attesi
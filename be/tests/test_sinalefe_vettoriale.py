@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+import server
+from sinalefe_vettoriale import BatchSinalefe, conta_sinalefe_batch
+from tokenizzatore import VersoTokenizzato, doc_spacy
+
+COMMEDIA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "commedia.txt")
+
+VERSI = [
+    "Nel mezzo del cammin di nostra vita",
+    "mi ritrovai per una selva oscura,",
+    "ché la diritta via era smarrita.",
+    "Ahi quanto a dir qual era è cosa dura",
+    "e 'l sol montava 'n sù con quelle stelle",
+    "vita, amore; ecco: ombra! ha onore",
+    "",
+]
+
+
+def versi_commedia():
+    with open(COMMEDIA, encoding="utf-8") as f:
+        return [riga.rstrip("\n") for riga in f]
+
+
+@pytest.mark.parametrize("versi", [
+    VERSI,
+    pytest.param(None, marks=pytest.mark.skipif(not os.path.exists(COMMEDIA), reason="commedia.txt non disponibile")),
+])
+def test_batch_uguale_a_conta_sinalefe_token(versi):
+    docs = [VersoTokenizzato(verso) for verso in (versi if versi is not None else versi_commedia())]
+    attesi = [server.conta_sinalefe_token(doc) for doc in docs]
+    assert conta_sinalefe_batch(docs).tolist() == attesi
+
+    batch = BatchSinalefe()
+    for doc in docs:
+        batch.aggiungi(doc)
+    assert [len(posizioni) for posizioni in batch.posizioni()] == attesi
+
+
+def test_doc_spacy_uguale_a_conta_sinalefe_token():
+    spacy = pytest.importorskip("spacy")
+    nlp = spacy.blank("it")
+    docs = [doc_spacy(nlp, verso) for verso in VERSI]
+    assert conta_sinalefe_batch(docs).tolist() == [server.conta_sinalefe_token(doc) for doc in docs]